@@ -0,0 +1,68 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from nietzsche.stencil import explicit_step, blocked_solve, _block_shape
+
+"""
+Benchmark of the cache and temporally blocked diffusion kernel against stepping
+the whole array one time level at a time. Only measured wall times are reported.
+The blocked kernel runs several numpy calls per tile and step, and on small tiles
+that overhead can outweigh the memory traffic it saves. The default tiles (slabs
+along x, one step per tile) come first, and the script exits with an error when
+they are slower than the full array kernel.
+
+    PYTHONPATH=. python benchmarks/stencil_blocking.py --n 200 --steps 8
+"""
+
+
+def full_array(history, step_constant):
+    inner = tuple(n - 2 for n in history.shape[1:])
+    out, work = np.empty(inner), np.empty(inner)
+    for k in range(history.shape[0] - 1):
+        explicit_step(history[k], history[k + 1], step_constant, out=out, work=work)
+
+
+def timed(kernel, history, step_constant, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        trial = history.copy()
+        start = time.perf_counter()
+        kernel(trial, step_constant)
+        best = min(best, time.perf_counter() - start)
+    return best, trial
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="allowed slowdown of the default tiles before failing")
+    args = parser.parse_args()
+
+    shape = (args.n,) * 3
+    history = np.zeros((args.steps + 1,) + shape)
+    history[0] = np.random.rand(*shape)
+
+    t_full, reference = timed(full_array, history, 0.1, args.repeat)
+    print(f"grid {shape}, {args.steps} steps, best of {args.repeat}")
+    print(f"{'kernel':44s} {'ms/step':>9s} {'speedup':>8s}")
+    print(f"{'full array':44s} {t_full/args.steps*1e3:9.1f} {1:8.2f}")
+    configs = [(None, 1, 2**20), (8, 2, 2**20), (4, 1, 2**20), (16, 1, 2**20),
+               ('cube', 1, 2**20), ('cube', 2, 2**20), ('cube', 2, 2**22)]
+    speedups = []
+    for block, time_block, cache_bytes in configs:
+        tiles = _block_shape(shape, block, time_block, history.itemsize, cache_bytes)
+        t_blocked, result = timed(
+            lambda h, c: blocked_solve(h, c, tiles, time_block), history, 0.1, args.repeat)
+        assert np.array_equal(result, reference)
+        speedups.append(t_full / t_blocked)
+        label = f"{'default ' if block is None else ''}blocked {tiles}, time block {time_block}"
+        print(f"{label:44s} {t_blocked/args.steps*1e3:9.1f} {speedups[-1]:8.2f}")
+    if speedups[0] < 1 - args.tolerance:
+        sys.exit(f"the default blocking is slower than the full array kernel "
+                 f"({speedups[0]:.2f}x)")
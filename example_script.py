@@ -36,7 +36,7 @@ if __name__ == "__main__":
                                                     thickness=1)
     diff.solve(step_constant=0.03)
 
-    # write the simulation result in a csv
+    # write the simulation result to an h5 file
     if s.dimension == 1:
         diff.export_result()
     elif s.dimension == 2:
@@ -0,0 +1,167 @@
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+
+from .pde import Diffusion
+from .result import Result
+
+"""
+The cache module memoizes solved Diffusion runs on the local disk. A run is
+addressed by a hash of everything that determines its result: the space and time
+grids, the primal domain before the solve (i.e. the initial and boundary values)
+and the solve parameters. Solved runs are stored as Result files and the least
+recently used ones are removed when the cache grows beyond its size limit.
+"""
+
+# solve options that change how a run is computed but not its result
+EXECUTION_OPTIONS = ('workers', 'block', 'time_block')
+
+
+class SolveCache:
+    """
+    Description:
+    ============
+        Size bounded on-disk cache of solved Diffusion runs
+
+    Parameters:
+    ============
+        directory: [str]
+            Directory of the cache files, created if needed
+        max_bytes: [int]
+            Size limit of the cache, the least recently used runs are removed
+            once the files take more space than that
+
+    Example:
+    ============
+        >>> cache = SolveCache('.nietzsche_cache', max_bytes=2**30)
+        >>> res = cache.solve(diff, step_constant=0.1)  # solves and stores
+        >>> res = cache.solve(diff, step_constant=0.1)  # read from disk
+        >>> cache.stats
+    """
+
+    def __init__(self, directory='.nietzsche_cache', max_bytes=2**30) -> None:
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    @staticmethod
+    def key(diffusion, step_constant, **options):
+        """
+        Description:
+        =============
+            Content hash of a Diffusion problem before it is solved
+
+        Parameters:
+        =============
+            diffusion: [Diffusion]
+                Problem with the primal domain, initial and boundary values set
+            step_constant: [float]
+                Step constant of the solve
+            options: [dict]
+                Further options of Diffusion.solve. They are bound to the
+                signature of Diffusion.solve with the defaults filled in, so
+                leaving out an option and passing its default give the same key.
+
+        Returns:
+        =============
+            Hex digest of the problem
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        bound = inspect.signature(Diffusion.solve).bind(diffusion, step_constant, **options)
+        bound.apply_defaults()
+        parameters = {name: value for name, value in bound.arguments.items()
+                      if name != 'self' and name not in EXECUTION_OPTIONS}
+        digest.update(json.dumps(parameters, sort_keys=True, default=repr).encode())
+        for array in [diffusion.time, *diffusion.space, diffusion.primal_domain]:
+            array = np.ascontiguousarray(array)
+            digest.update(f'{array.dtype.str}{array.shape}'.encode())
+            digest.update(memoryview(array).cast('B'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.h5')
+
+    def solve(self, diffusion, step_constant, **options):
+        """
+        Description:
+        =============
+            Returns the solved run from the cache or solves it and stores it.
+            On a hit the solve is skipped entirely and the primal domain of
+            diffusion is left as it is.
+
+        Parameters:
+        =============
+            diffusion: [Diffusion]
+                Problem with the primal domain, initial and boundary values set.
+                It has to store the full history.
+            step_constant: [float]
+                Step constant of the solve
+            options: [dict]
+                Further options passed on to Diffusion.solve
+
+        Returns:
+        =============
+            Result opened lazily on the cached file
+        """
+        if options.get('diagnostics') is not None:
+            raise ValueError('Diagnostics can not be taken from a cached run!')
+        if diffusion.primal_domain is None or len(diffusion.primal_domain) != len(diffusion.time):
+            raise ValueError('Only runs that store the full history can be cached!')
+        key = self.key(diffusion, step_constant, **options)
+        path = self.path(key)
+        if os.path.exists(path):
+            self.hits += 1
+            # mark as recently used
+            os.utime(path)
+            return Result(path)
+        self.misses += 1
+        diffusion.solve(step_constant, **options)
+        partial = f'{path}.{os.getpid()}.partial'
+        diffusion.export_result(partial, parameters={'cache_key': key})
+        os.replace(partial, path)
+        self.evict(keep=path)
+        return Result(path)
+
+    def evict(self, keep=None):
+        """
+        Description:
+        =============
+            Removes the least recently used runs until the cache fits in
+            max_bytes. The run at `keep` is never removed.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.h5'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
+            self.evictions += 1
+        return None
+
+    def clear(self):
+        """
+        Description:
+        =============
+            Removes every run from the cache
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith('.h5'):
+                os.remove(os.path.join(self.directory, name))
+        return None
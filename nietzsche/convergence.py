@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+
+from .pde import Diffusion
+from .stencil import COEFFICIENTS
+
+"""
+The convergence module compares the accuracy and the cost of the spatial stencils
+of the diffusion solver. Every run solves the decay of the lowest sine mode on the
+unit cube with zero boundary values, for which the exact solution is known:
+
+    u(x, t) = sin(pi x) sin(pi y) sin(pi z) exp(-ndim pi^2 t)
+
+The error of a run is measured against this exact solution, so it is the error a
+solve actually has. It is split into the time error of forward Euler, which grows
+like step_constant * dx^2, and the space error of the stencil, measured against
+the exact Laplacian stepped by the same forward Euler scheme (the mode then decays
+by a factor 1 - ndim pi^2 dt per step). At a fixed step constant the time error
+caps every order at second order convergence; to profit from the fourth and sixth
+order stencils the step constant has to shrink like dx^(order-2), which the study
+does with scale_step=True and which shows up in the cost.
+"""
+
+
+def _stencil_points(order, ndim):
+    return ndim * (len(COEFFICIENTS[order]) - 1) * 2 + 1
+
+
+def _rate(previous, error, dx):
+    if previous is None:
+        return None
+    return float(np.log(previous[0] / error) / np.log(previous[1] / dx))
+
+
+def convergence_study(orders=(2, 4), resolutions=(11, 21, 41), dimension=1,
+                      t_final=0.05, step_constant=0.02, scale_step=False):
+    """
+    Description:
+    =============
+        Solves the same problem with every stencil order on every resolution and
+        reports the error against the exact solution, split into its time and
+        space parts, with the observed convergence rates and the cost of the run.
+
+    Parameters:
+    =============
+        orders: [sequence]
+            Stencil orders to compare, see Diffusion.solve
+        resolutions: [sequence]
+            Number of grid points per axis
+        dimension: [int]
+            Number of space dimensions, 1, 2 or 3
+        t_final: [float]
+            Time at which the error is measured
+        step_constant: [float]
+            D*dt/dx^2 of the runs on the first resolution. The number of steps
+            is rounded up, so the actual step constant can be slightly smaller.
+        scale_step: [bool]
+            Shrink the step constant like (dx / dx of the first resolution)^(order-2)
+            so the time error falls at the order of the stencil
+
+    Returns:
+    =============
+        List of dicts, one per run, with the keys order, points (grid points
+        per axis), dx, steps, error (max norm against the exact solution),
+        time_error and space_error (the two parts of it), rate and space_rate
+        (observed orders of error and space_error against the previous
+        resolution, None for the first), cost (stencil point updates) and
+        seconds (wall time of the solve)
+
+    Example:
+    =============
+        >>> for row in convergence_study(orders=(2, 4), resolutions=(11, 21, 41), scale_step=True):
+        >>>     print(row['order'], row['points'], row['error'], row['rate'], row['cost'])
+    """
+    rows = []
+    for order in orders:
+        previous = None
+        first_dx = None
+        for n in resolutions:
+            space = [np.linspace(0.0, 1.0, n) for _ in range(dimension)]
+            dx = space[0][1] - space[0][0]
+            first_dx = first_dx or dx
+            constant = step_constant
+            if scale_step:
+                constant = step_constant * (dx / first_dx)**(order - 2)
+            steps = int(np.ceil(t_final / (constant * dx**2)))
+            dt = t_final / steps
+            diff = Diffusion()
+            diff.set_primal_domain(space, np.linspace(0.0, t_final, steps + 1),
+                                   store_history=False)
+            mode = 1.0
+            for g in np.ix_(*space):
+                mode = mode * np.sin(np.pi * g)
+            field = diff.time_level(0)
+            field[...] = mode
+            # the edge is exactly zero in every time level
+            diff.primal_domain = diff.boundary_condition(diff.primal_domain, 0.0, thickness=1)
+            start = time.perf_counter()
+            diff.solve(dt / dx**2, order=order)
+            seconds = time.perf_counter() - start
+            decay = dimension * np.pi**2
+            exact = mode * np.exp(-decay * t_final)
+            euler = mode * (1.0 - decay * dt)**steps
+            error = float(np.abs(diff.time_level(-1) - exact).max())
+            space_error = float(np.abs(diff.time_level(-1) - euler).max())
+            rows.append({'order': order,
+                         'points': n,
+                         'dx': dx,
+                         'steps': steps,
+                         'error': error,
+                         'time_error': float(np.abs(euler - exact).max()),
+                         'space_error': space_error,
+                         'rate': _rate(previous and previous[:2], error, dx),
+                         'space_rate': _rate(previous and previous[2:], space_error, dx),
+                         'cost': steps * (n - 2)**dimension * _stencil_points(order, dimension),
+                         'seconds': seconds})
+            previous = (error, dx, space_error, dx)
+    return rows
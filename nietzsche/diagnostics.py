@@ -0,0 +1,178 @@
+import numpy as np
+
+"""
+The diagnostics module samples reductions, probes and slices of the primal field
+while a PDE is solved. Everything is written into arrays that are allocated once
+before the solve, one row per sample, so a monitoring run does not need to keep
+the full history of the primal domain around.
+"""
+
+
+def _builtin_reduction(name, volume):
+    """
+    Description:
+    =============
+        Built in reductions of a field. mass and energy are integrals over the
+        domain, i.e. they are scaled with the volume of a grid cell.
+    """
+    if name == 'mass':
+        return lambda u: u.sum() * volume
+    if name == 'energy':
+        return lambda u: np.vdot(u, u) * volume
+    if name in ('max', 'min', 'mean'):
+        return getattr(np, name)
+    raise ValueError(f'There is no built in reduction called {name}!')
+
+
+class Diagnostics:
+    """
+    Description:
+    ============
+        Collection of quantities that are sampled every `every` time steps
+        during a solve.
+
+    Parameters:
+    ============
+        every: [int]
+            Number of time steps between two samples
+
+    Example:
+    ============
+        >>> diag = Diagnostics(every=10)
+        >>> diag.add_reduction('mass')
+        >>> diag.add_reduction('peak', lambda u: np.abs(u).max())
+        >>> diag.add_probe('sensor', (0.5, 0.5, 0.5))
+        >>> diag.add_slice('mid', axis=2, position=0.5)
+        >>> diff.solve(0.1, diagnostics=diag)
+        >>> diag.time, diag.values['mass'], diag.values['mid']
+    """
+
+    def __init__(self, every: int = 1) -> None:
+        if every < 1:
+            raise ValueError('Diagnostics need to be sampled at least every step!')
+        self.every = every
+        self.time = None    # time of every sample
+        self.values = {}    # name -> array with one row per sample
+        self._reductions = {}
+        self._probes = {}
+        self._slices = {}
+        self._samplers = {}
+
+    def add_reduction(self, name, func=None):
+        """
+        Description:
+        =============
+            Registers a reduction of the whole field
+
+        Parameters:
+        =============
+            name: [str]
+                Name of the series. Without func this picks a built in
+                reduction: mass, energy, max, min or mean.
+            func: [callable]
+                Function that maps the field to a number
+        """
+        self._check_name(name)
+        self._reductions[name] = func
+        return None
+
+    def add_probe(self, name, point):
+        """
+        Description:
+        =============
+            Registers the value at the grid point closest to a location
+
+        Parameters:
+        =============
+            name: [str]
+                Name of the series
+            point: [float or sequence]
+                Location in physical coordinates
+        """
+        self._check_name(name)
+        self._probes[name] = np.atleast_1d(point)
+        return None
+
+    def add_slice(self, name, axis, position):
+        """
+        Description:
+        =============
+            Registers the plane (or line in 2D) through the grid point closest
+            to a position along an axis
+
+        Parameters:
+        =============
+            name: [str]
+                Name of the series
+            axis: [int]
+                Space axis normal to the slice, 0 for x
+            position: [float]
+                Position of the slice along the axis in physical coordinates
+        """
+        self._check_name(name)
+        self._slices[name] = (axis, position)
+        return None
+
+    def _check_name(self, name):
+        if name in self._reductions or name in self._probes or name in self._slices:
+            raise ValueError(f'A series named {name} is already registered!')
+
+    def setup(self, space, time, nsteps=None):
+        """
+        Description:
+        =============
+            Resolves all locations on the grid and allocates the sample arrays.
+            This is called by the solver before the first step.
+
+        Parameters:
+        =============
+            space: [list]
+                List of numpy arrays for each dimension of the space domain
+            time: [np.ndarray]
+                Time grid of the solve
+            nsteps: [int]
+                Number of time steps, defaults to len(time) - 1
+        """
+        if nsteps is None:
+            nsteps = len(time) - 1
+        samples = nsteps // self.every + 1
+        self.time = np.asarray(time)[:nsteps + 1:self.every]
+        volume = np.prod([axis[1] - axis[0] for axis in space if len(axis) > 1])
+        shape = tuple(len(axis) for axis in space)
+        self._samplers = {}
+        self.values = {}
+        for name, func in self._reductions.items():
+            self._samplers[name] = func or _builtin_reduction(name, volume)
+            self.values[name] = np.empty(samples)
+        for name, point in self._probes.items():
+            if len(point) != len(space):
+                raise ValueError(f'The probe {name} needs {len(space)} coordinates!')
+            index = tuple(int(np.abs(axis - p).argmin()) for axis, p in zip(space, point))
+            self._samplers[name] = lambda u, index=index: u[index]
+            self.values[name] = np.empty(samples)
+        for name, (axis, position) in self._slices.items():
+            index = int(np.abs(space[axis] - position).argmin())
+            self._samplers[name] = lambda u, axis=axis, index=index: np.take(u, index, axis=axis)
+            self.values[name] = np.empty((samples,) + shape[:axis] + shape[axis + 1:])
+        return None
+
+    def sample(self, k, field):
+        """
+        Description:
+        =============
+            Records every registered quantity of the field at time step k if k
+            is a multiple of `every`
+
+        Parameters:
+        =============
+            k: [int]
+                Time step of the field
+            field: [np.ndarray]
+                The primal field at time step k
+        """
+        if k % self.every:
+            return None
+        row = k // self.every
+        for name, sampler in self._samplers.items():
+            self.values[name][row] = sampler(field)
+        return None
@@ -0,0 +1,158 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .stencil import explicit_step
+
+"""
+The parallel module runs the explicit diffusion solve on several worker processes.
+The domain is split into slabs along the first space axis and every worker owns
+the interior rows of one slab. The workers share three time levels in one shared
+memory block, so the one cell halo of a slab is simply read from the rows owned by
+the neighbouring workers. The process that starts the workers keeps them in step:
+every worker reports a finished step and waits for the go of the next one, which
+is only given once all workers are done. While the workers compute the next step,
+the starting process copies the finished level back into the primal domain and
+loads the boundary values of the level after that.
+"""
+
+# time levels held in shared memory: the one read, the one written and the
+# one that is copied back and prepared by the starting process
+SLOTS = 3
+
+
+def decompose(n, workers):
+    """
+    Description:
+    =============
+        Splits the interior rows 1 .. n-2 of an axis with n points into at most
+        `workers` contiguous slabs of nearly equal size.
+
+    Returns:
+    =============
+        List of (start, stop) tuples of the rows owned by each slab
+    """
+    bounds = np.linspace(1, n - 1, min(workers, n - 2) + 1).round().astype(int)
+    return [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+def _worker(name, shape, dtype, lo, hi, step_constant, nsteps, done, go):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        levels = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        # the slab together with its halo rows lo-1 and hi
+        inner = (hi - lo,) + tuple(n - 2 for n in shape[2:])
+        out = np.empty(inner, dtype=dtype)
+        work = np.empty(inner, dtype=dtype)
+        for k in range(nsteps):
+            if k > 0:
+                go.acquire()
+            explicit_step(levels[k % SLOTS, lo - 1:hi + 1],
+                          levels[(k + 1) % SLOTS, lo - 1:hi + 1],
+                          step_constant, out=out, work=work)
+            done.release()
+    finally:
+        levels = None
+        shm.close()
+
+
+def _copy_edges(src, dst):
+    """
+    Description:
+    =============
+        Copies the cells on the edge of src into dst
+    """
+    for axis in range(src.ndim):
+        for face in (0, -1):
+            index = (slice(None),) * axis + (face,)
+            dst[index] = src[index]
+
+
+def _stop(processes):
+    for p in processes:
+        if p.is_alive():
+            p.terminate()
+    for p in processes:
+        p.join()
+
+
+def solve_decomposed(primal_domain, step_constant, workers, nsteps=None, callback=None):
+    """
+    Description:
+    =============
+        Explicit solve of the diffusion equation over the time levels of the
+        primal domain, split across worker processes. The result is identical
+        to the single process solve. Only three time levels are held in shared
+        memory, so the extra memory does not grow with the history.
+
+    Parameters:
+    =============
+        primal_domain: [np.ndarray]
+            Array of shape (time, x, ...) with the initial and boundary values set.
+            It is updated in place. With fewer levels than time steps it is used
+            as a ring buffer, time step k living in level k % len(primal_domain).
+        step_constant: [float]
+            D*dt/dx^2 of the explicit scheme
+        workers: [int]
+            Number of worker processes
+        nsteps: [int]
+            Number of time steps, defaults to len(primal_domain) - 1
+        callback: [callable]
+            Called as callback(k, field) for every completed time step k
+
+    Returns:
+    =============
+        None
+    """
+    slabs = decompose(primal_domain.shape[1], workers)
+    count = primal_domain.shape[0]
+    if nsteps is None:
+        nsteps = count - 1
+    if nsteps < 1:
+        return None
+    ctx = mp.get_context()
+    shape = (SLOTS,) + primal_domain.shape[1:]
+    shm = shared_memory.SharedMemory(create=True,
+                                     size=int(np.prod(shape)) * primal_domain.itemsize)
+    try:
+        levels = np.ndarray(shape, dtype=primal_domain.dtype, buffer=shm.buf)
+        levels[0] = primal_domain[0]
+        _copy_edges(primal_domain[1 % count], levels[1])
+        done = ctx.Semaphore(0)
+        gos = [ctx.Semaphore(0) for _ in slabs]
+        processes = [ctx.Process(target=_worker,
+                                 args=(shm.name, shape, primal_domain.dtype, lo, hi,
+                                       step_constant, nsteps, done, go))
+                     for (lo, hi), go in zip(slabs, gos)]
+        for p in processes:
+            p.start()
+        try:
+            for k in range(nsteps):
+                for _ in processes:
+                    # watch the workers while waiting, a killed one never reports
+                    while not done.acquire(timeout=0.1):
+                        failed = [p.exitcode for p in processes if p.exitcode not in (None, 0)]
+                        if failed:
+                            raise RuntimeError(
+                                f'Worker process failed with exit code {failed[0]}!')
+                if k + 1 < nsteps:
+                    for go in gos:
+                        go.release()
+                # level k+1 is only read by the workers until the next go
+                primal_domain[(k + 1) % count] = levels[(k + 1) % SLOTS]
+                if k + 2 <= nsteps:
+                    _copy_edges(primal_domain[(k + 2) % count], levels[(k + 2) % SLOTS])
+                if callback is not None:
+                    callback(k + 1, primal_domain[(k + 1) % count])
+        except BaseException:
+            _stop(processes)
+            raise
+        for p in processes:
+            p.join()
+    finally:
+        # drop the view on the shared block before closing it
+        levels = None
+        shm.close()
+        shm.unlink()
+    return None
@@ -1,6 +1,8 @@
+import asyncio
+import threading
+from collections import namedtuple
+
 import numpy as np
-import pandas as pd
-import h5py
 import matplotlib.pyplot as plt            # plotting the data
 import matplotlib.animation as animation   # animation of the plot
 from matplotlib.animation import FuncAnimation  # animate a function
@@ -9,6 +11,13 @@ import imageio
 from .space import Space
 from .time_ import Time
 from .utils import Dimension
+from .stencil import (explicit_step, blocked_solve, stable_step_constant, rkl_step,
+                      super_stages, super_step_factor)
+from .parallel import solve_decomposed
+from .result import Result
+
+# snapshot of the primal field at a time step, yielded by Diffusion.iter_solve
+Snapshot = namedtuple('Snapshot', ['step', 'time', 'field'])
 
 class PDE:
     """
@@ -86,6 +95,7 @@ class Diffusion(PDE):
         self.time = None # time domain to be used by the diffusion simulation
         self.primal_domain = None # the primal domain for the diffusion simulation
         self.dt = None # dt value for the simulation in case explicit scheme is invalid
+        self.step_constant = None # step constant used by the last solve
 
     def set_dt(self):
         """
@@ -112,7 +122,7 @@ class Diffusion(PDE):
             raise ValueError(f'dt for simulation was not set correctly')
         return None
 
-    def set_primal_domain(self, space_array, time_array):
+    def set_primal_domain(self, space_array, time_array, store_history=True, levels=2):
         """
         Description:
         ============
@@ -129,6 +139,14 @@ class Diffusion(PDE):
             time_object: np.ndarray
                 time parameter to be used in the diffusion simulation.
                 This is obtained after using the time.setup method
+            store_history: [bool]
+                Keep every time level. Without history only `levels` levels
+                are stored and reused in turn during the solve, which is enough
+                when the run is monitored with Diagnostics. Use time_level to
+                get the field at a time step.
+            levels: [int]
+                Number of time levels stored without history, at least 2. The
+                blocked kernel needs time_block + 1 levels.
 
         Returns:
         ============
@@ -160,20 +178,43 @@ class Diffusion(PDE):
         self.space = space_array
         self.time = time_array
         self.set_dt()  # set the dt value for the simulation
+        if levels < 2:
+            raise ValueError('The primal domain needs at least two time levels!')
+        levels = len(self.time) if store_history else levels
         if len(self.space) == 1:
-            self.primal_domain = np.zeros([len(self.time), len(self.space[0])])
+            self.primal_domain = np.zeros([levels, len(self.space[0])])
         elif len(self.space) == 2:
             self.primal_domain = np.zeros(
-                [len(self.time), len(self.space[0]), len(self.space[1])])
+                [levels, len(self.space[0]), len(self.space[1])])
         elif len(self.space) == 3:
             self.primal_domain = np.zeros(
-                [len(self.time),
+                [levels,
                  len(self.space[0]),
                  len(self.space[1]),
                  len(self.space[2])])
         else:
             raise ValueError('Could not set the primal field for the solve!')
 
+    def time_level(self, k):
+        """
+        Description:
+        ============
+            The primal field at time step k. Without stored history only the
+            last few time steps of a solve are available, one per stored level.
+
+        Parameters:
+        ============
+            k: [int]
+                Time step, negative values count from the end of the time domain
+
+        Returns:
+        ============
+            View of the primal domain at time step k
+        """
+        if self.primal_domain is None:
+            raise ValueError('Could not set primal domain correctly!')
+        return self.primal_domain[k % len(self.time) % len(self.primal_domain)]
+
     @staticmethod
     def boundary_condition(primal_domain, constant_value, thickness=2, mode="Constant"):
         """
@@ -267,7 +308,7 @@ class Diffusion(PDE):
         if self.primal_domain is not None:
             self.primal_domain[0].fill(general_value)
             if self.primal_domain.ndim == 2:
-                self.primal_domain[:, x_ilocation:x_elocation] = specific_value
+                self.primal_domain[0, x_ilocation:x_elocation] = specific_value
             elif self.primal_domain.ndim == 3:
                 self.primal_domain[0,
                                    x_ilocation:x_elocation,
@@ -281,17 +322,92 @@ class Diffusion(PDE):
             raise ValueError('Could not set primal domain correctly!')
         return None
 
-    def solve(self, step_constant):
+    def set_initial_condition(self, general_value: float, *shapes):
+        """
+        Description:
+        =============
+            Sets the initial condition from shapes given in physical coordinates.
+            The domain is first filled with a general value and then every shape
+            is applied on top in the order given, so later shapes win where they
+            overlap (Gaussian bumps are added instead). Only the initial time
+            level of the primal domain is written.
+
+        Parameters:
+        =============
+            general_value: [float]
+                The constant value of the primal domain in general
+            shapes: [Shape]
+                Any number of shapes from nietzsche.shapes, e.g. Box, Sphere,
+                Gaussian or Mask
+
+        Returns:
+        =============
+            None
+
+        Example:
+        =============
+        >>> # set diffusion
+        >>> diff = Diffusion()
+        >>> diff.set_primal_domain(space_array=x,time_array=t)
+        >>> diff.set_initial_condition(0.0,
+        >>>                            Box(lower=(0.2, 0.2), upper=(0.4, 0.5), value=40.0),
+        >>>                            Sphere(center=(0.7, 0.7), radius=0.1, value=10.0))
+        """
+        if self.primal_domain is None:
+            raise ValueError('Could not set primal domain correctly!')
+        field = self.primal_domain[0]
+        field.fill(general_value)
+        for shape in shapes:
+            shape.apply(field, self.space)
+        return None
+
+    def solve(self, step_constant, workers=1, block=None, time_block=1, diagnostics=None,
+              order=2, scheme='euler', stages=None):
         """
         Description:
         =============
             This does an explicit marching in time to estimate the pressure
-            domain in the homogenoeus scheme.
+            domain in the homogenoeus scheme. Every time level is updated as a
+            whole array with the stencils from nietzsche.stencil; only the
+            interior is written, so boundary values are kept.
 
         Parameters:
         =============
             step_constant: [float]
                 The constant value of the primal domain in general
+            workers: [int]
+                Number of worker processes. With more than one worker the domain
+                is split into slabs along x that are stepped in parallel, see
+                nietzsche.parallel. The result is the same as with one worker.
+            block: [int, sequence or str]
+                Tile size per space axis for the cache blocked kernel, 'auto'
+                for the default slabs along x or 'cube' for cube tiles sized to
+                fit the cache. When set, the domain is stepped tile by tile,
+                see stencil.blocked_solve.
+            time_block: [int]
+                Number of time steps advanced per tile with the blocked kernel,
+                it has to be smaller than the number of stored time levels
+            diagnostics: [Diagnostics]
+                Quantities from nietzsche.diagnostics that are sampled during
+                the solve, see Diagnostics
+            order: [int]
+                Order of accuracy of the Laplacian: 2, 4 or 6. The higher orders
+                only lower the space error; the forward Euler time error grows
+                like step_constant * dx^2, so the step constant has to shrink
+                like dx^(order-2) to converge at the higher order, see
+                nietzsche.convergence. They are only available with the single
+                process, unblocked kernel. The step constant has to stay below
+                stencil.stable_step_constant for the order.
+            scheme: [str]
+                Time stepping scheme: euler for forward Euler, or rkl1 / rkl2 for
+                Runge-Kutta-Legendre super time stepping. A super step takes
+                `stages` stencil applications and allows a step constant up to
+                stencil.super_step_factor(stages) times the forward Euler limit,
+                so long diffusion times need far fewer stencil applications.
+                Super stepping uses the single process, unblocked kernel.
+            stages: [int]
+                Number of stages of a super step. None picks the smallest number
+                that is stable for the step constant.
 
         Returns:
         =============
@@ -304,45 +420,271 @@ class Diffusion(PDE):
         >>> diff.set_primal_domain(space_object=x,time_object=t)
         >>> diff.boundary_condition(constant_value=1.0)
         >>> diff.solve(0.1)
+        >>> diff.solve(0.1, workers=4)  # split the domain over 4 processes
+        >>> diff.solve(0.1, block='auto')  # cache blocked kernel
+        >>> diff.solve(0.05, order=4)  # fourth order Laplacian
+        >>> diff.solve(2.5, scheme='rkl2')  # super steps, 10 times the Euler limit in 2D
         """
-        if self.space is not None and self.time is not None:
-            if len(self.space) == 1:
-                for k in range(0, len(self.time)-1, 1):
-                    for i in range(1, len(self.space[0])-1):
-                        self.primal_domain[k + 1, i] = step_constant * (self.primal_domain[k][i+1] + self.primal_domain[k][i-1] -
-                                                                        2*self.primal_domain[k][i]) + self.primal_domain[k][i]
-            elif len(self.space) == 2:
-                for k in range(0, len(self.time)-1, 1):
-                    for i in range(1, len(self.space[0])-1):
-                        for j in range(1, len(self.space[1])-1):
-                            # print(self.primal_domain)
-                            self.primal_domain[k + 1, i, j] = step_constant * (self.primal_domain[k][i+1][j] + self.primal_domain[k][i-1][j] +
-                                                                               self.primal_domain[k][i][j+1] + self.primal_domain[k][i][j-1] -
-                                                                               4*self.primal_domain[k][i][j]) + self.primal_domain[k][i][j]
-            elif len(self.space) == 3:
-                for l in range(0, len(self.time)-1, 1):
-                    for k in range(0, len(self.space[0])-1):
-                        for i in range(1, len(self.space[1])-1):
-                            for j in range(1, len(self.space[2])-1):
-                                self.primal_domain[l + 1, k, i, j] = step_constant * (self.primal_domain[l][k][i+1][j] + self.primal_domain[l][k][i-1][j] +
-                                                                                      self.primal_domain[l][k][i][j+1] + self.primal_domain[l][k][i][j-1] +
-                                                                                      self.primal_domain[l][k+1][i][j] + self.primal_domain[l][k-1][i][j] -
-                                                                                      6*self.primal_domain[l][k][i][j]) + self.primal_domain[l][k][i][j]
-        else:
+        if self.space is None or self.time is None or self.primal_domain is None:
             raise ValueError(
                 "Could not set the space, time or primal domain most likely in the simulation!")
+        stages = self._check_step_constant(step_constant, order, scheme, stages)
+        self.step_constant = step_constant
+        if workers > 1 and block is not None:
+            raise ValueError('The blocked kernel can not be combined with workers!')
+        if (order != 2 or scheme != 'euler') and (workers > 1 or block is not None):
+            raise ValueError('Higher order stencils and super time stepping need '
+                             'the single process, unblocked kernel!')
+        if block is not None and time_block >= len(self.primal_domain):
+            raise ValueError(f'A time block of {time_block} steps needs {time_block + 1} stored '
+                             f'time levels, but the primal domain has {len(self.primal_domain)}. '
+                             f'Pass levels={time_block + 1} to set_primal_domain or use a '
+                             f'smaller time_block!')
+        nsteps = len(self.time) - 1
+        callback = None
+        if diagnostics is not None:
+            diagnostics.setup(self.space, self.time, nsteps)
+            diagnostics.sample(0, self.time_level(0))
+            callback = diagnostics.sample
+        if block is not None:
+            blocked_solve(self.primal_domain, step_constant,
+                          None if block == 'auto' else block, time_block,
+                          nsteps=nsteps, callback=callback)
+            return None
+        if workers > 1:
+            solve_decomposed(self.primal_domain, step_constant, workers,
+                             nsteps=nsteps, callback=callback)
+            return None
+        for k in self._march(step_constant, order, scheme, stages):
+            if callback is not None:
+                callback(k, self.time_level(k))
         return None
 
-    def export_result(self):
-        if self.primal_domain.ndim == 2:
-            df = pd.DataFrame(self.primal_domain[:,:], index = self.time)
-            df.to_csv('results.csv')
-        else:
-            with h5py.File('finite_difference_results.h5', 'w') as hf:
-                hf.create_dataset('data', data=self.primal_domain)
-                hf.create_dataset('time', data=self.time)
-                hf.create_dataset('space', data=self.space)
+    def _check_step_constant(self, step_constant, order, scheme='euler', stages=None):
+        """
+        Description:
+        =============
+            Checks the step constant against the stability limit of the scheme
+            and returns the number of stages of a super step (None for euler).
+        """
+        limit = stable_step_constant(len(self.space), order)
+        if scheme != 'euler':
+            if stages is None:
+                stages = super_stages(step_constant, limit, scheme)
+            limit = limit * super_step_factor(stages, scheme)
+        if step_constant > limit:
+            raise ValueError(f'The step constant {step_constant} is above the stability '
+                             f'limit {limit:.4g} of the explicit scheme!')
+        return stages
+
+    def _march(self, step_constant, order=2, scheme='euler', stages=None, cancel=None):
+        """
+        Description:
+        =============
+            Steps the primal domain one time step at a time with the explicit
+            scheme and yields the index of every completed time step. Once the
+            `cancel` event is set no further step is taken.
+        """
+        inner = tuple(n - 2 for n in self.primal_domain.shape[1:])
+        out = np.empty(inner)
+        work = np.empty(inner)
+        if scheme != 'euler':
+            buffers = [np.empty(self.primal_domain.shape[1:]) for _ in range(3)]
+            scratch = [out, work, np.empty(inner)]
+        for k in range(0, len(self.time) - 1, 1):
+            if cancel is not None and cancel.is_set():
+                return
+            if scheme == 'euler':
+                explicit_step(self.time_level(k), self.time_level(k + 1),
+                              step_constant, out=out, work=work, order=order)
+            else:
+                rkl_step(self.time_level(k), self.time_level(k + 1), step_constant,
+                         stages, scheme=scheme, order=order, buffers=buffers,
+                         scratch=scratch)
+            yield k + 1
+
+    def iter_solve(self, step_constant, every=1, copy=True, diagnostics=None, order=2,
+                   scheme='euler', stages=None, cancel=None):
+        """
+        Description:
+        =============
+            Same explicit solve as solve, but as a generator that yields a
+            snapshot of the primal field every `every` time steps, starting with
+            the initial condition and always ending with the last time step.
+            The solve advances only while the generator is consumed, so a run
+            is cancelled by closing the generator or simply not asking for more.
+            The arguments are checked right away, not on the first snapshot.
+
+        Parameters:
+        =============
+            step_constant: [float]
+                The constant value of the primal domain in general
+            every: [int]
+                Number of time steps between two snapshots
+            copy: [bool]
+                Yield copies of the field. Without copies the field is a view
+                on the primal domain that is overwritten later on when the
+                history is not stored.
+            diagnostics: [Diagnostics]
+                Quantities that are sampled during the solve, see solve
+            order: [int]
+                Order of accuracy of the Laplacian, see solve
+            scheme, stages: [str, int]
+                Time stepping scheme and its number of stages, see solve
+            cancel: [threading.Event]
+                Event that stops the stepping before the next time step once it
+                is set, also from another thread, without waiting for the next
+                snapshot
+
+        Returns:
+        =============
+            Generator of Snapshot(step, time, field)
+
+        Example:
+        =============
+        >>> for snap in diff.iter_solve(0.1, every=10):
+        >>>     print(snap.step, snap.time, snap.field.max())
+        """
+        if self.space is None or self.time is None or self.primal_domain is None:
+            raise ValueError(
+                "Could not set the space, time or primal domain most likely in the simulation!")
+        if every < 1:
+            raise ValueError('Snapshots need to be taken at least every step!')
+        stages = self._check_step_constant(step_constant, order, scheme, stages)
+        self.step_constant = step_constant
+        nsteps = len(self.time) - 1
+        if diagnostics is not None:
+            diagnostics.setup(self.space, self.time, nsteps)
+            diagnostics.sample(0, self.time_level(0))
+        steps = self._march(step_constant, order, scheme, stages, cancel)
+        return self._snapshots(steps, every, copy, diagnostics)
+
+    def _snapshots(self, steps, every, copy, diagnostics):
+        nsteps = len(self.time) - 1
+        yield self._snapshot(0, copy)
+        for k in steps:
+            if diagnostics is not None:
+                diagnostics.sample(k, self.time_level(k))
+            if k % every == 0 or k == nsteps:
+                yield self._snapshot(k, copy)
+
+    def _snapshot(self, k, copy):
+        field = self.time_level(k)
+        return Snapshot(k, self.time[k], field.copy() if copy else field)
+
+    async def aiter_solve(self, step_constant, every=1, maxsize=2, executor=None,
+                          diagnostics=None, order=2, scheme='euler', stages=None):
+        """
+        Description:
+        =============
+            Asynchronous version of iter_solve. The time stepping runs in an
+            executor (a thread by default, numpy releases the GIL in the stencil)
+            and the snapshots are handed over through a queue of `maxsize`
+            entries. When the consumer falls behind the queue fills up and the
+            stepping waits, so memory use stays bounded. Cancelling the task
+            that iterates, or closing the iterator, stops the stepping at the
+            next time step.
+
+        Parameters:
+        =============
+            step_constant: [float]
+                The constant value of the primal domain in general
+            every: [int]
+                Number of time steps between two snapshots
+            maxsize: [int]
+                Number of snapshots that can wait for the consumer
+            executor: [concurrent.futures.Executor]
+                Executor for the stepping, None uses the default of the loop
+            diagnostics: [Diagnostics]
+                Quantities that are sampled during the solve, see solve
+            order: [int]
+                Order of accuracy of the Laplacian, see solve
+            scheme, stages: [str, int]
+                Time stepping scheme and its number of stages, see solve
+
+        Returns:
+        =============
+            Async generator of Snapshot(step, time, field)
+
+        Example:
+        =============
+        >>> async for snap in diff.aiter_solve(0.1, every=10):
+        >>>     await writer.send(snap)
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize)
+        cancelled = threading.Event()
+        snapshots = self.iter_solve(step_constant, every, copy=True,
+                                    diagnostics=diagnostics, order=order,
+                                    scheme=scheme, stages=stages, cancel=cancelled)
+
+        def produce():
+            try:
+                for snapshot in snapshots:
+                    if cancelled.is_set():
+                        break
+                    # blocks while the queue is full
+                    asyncio.run_coroutine_threadsafe(queue.put(snapshot), loop).result()
+            finally:
+                snapshots.close()
+                asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+
+        task = loop.run_in_executor(executor, produce)
+        try:
+            while True:
+                snapshot = await queue.get()
+                if snapshot is None:
+                    break
+                yield snapshot
+            await task
+        finally:
+            cancelled.set()
+            # keep the queue drained so the stepping thread can finish
+            while not task.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait({task}, timeout=0.01)
+
+    def export_result(self, path='finite_difference_results.h5', parameters=None,
+                      chunks=None, return_result=False):
+        """
+        Description:
+        =============
+            Writes the primal domain with the time and space grids and the
+            parameters of the solve to a binary file, see nietzsche.result.
 
+        Parameters:
+        =============
+            path: [str]
+                Path of the file, .npz for NPZ and .h5 for HDF5
+            parameters: [dict]
+                Additional parameters to store next to dt and step_constant
+            chunks: [tuple]
+                HDF5 chunk shape of the data, see Result.write
+            return_result: [bool]
+                Return the written file opened as a Result. The Result holds
+                the file open until it is closed, which has to happen before
+                the same path is exported again.
+
+        Returns:
+        =============
+            Result opened lazily on the written file if return_result, else
+            the path of the file
+
+        Example:
+        =============
+        >>> diff.solve(0.1)
+        >>> with diff.export_result('run.h5', return_result=True) as res:
+        >>>     res.probe((0.5, 0.5))
+        """
+        if self.primal_domain is None:
+            raise ValueError('Could not set primal domain correctly!')
+        if len(self.primal_domain) != len(self.time):
+            raise ValueError('The primal domain does not store the full history!')
+        metadata = {'dt': float(self.dt), 'step_constant': self.step_constant}
+        metadata.update(parameters or {})
+        return Result.write(path, self.primal_domain, self.time, self.space, metadata,
+                            chunks=chunks, return_result=return_result)
 
     def diffusion_heatmap(self, pk, k):
         """
@@ -0,0 +1,210 @@
+import json
+
+import numpy as np
+import h5py
+
+"""
+The result module writes the solution of a PDE to a binary file together with the
+time and space grids and the parameters of the solve, and opens it again lazily.
+HDF5 files are written in chunks that span many time levels and a small block of
+space, so reading a time range, a window of the domain or a single probe point
+only touches the chunks that are needed. The chunk shape can be set per file.
+NPZ files are supported as a simple alternative, but the data array of an NPZ
+file is loaded as a whole on first access.
+"""
+
+AXES = ('x', 'y', 'z')
+
+
+def _chunks(shape, elements=2**15, time_chunk=32):
+    """
+    Description:
+    =============
+        Chunk shape of about `elements` values (256 KiB of float64) with
+        `time_chunk` time levels per chunk. A probe then reads a few KiB per
+        time level, while a snapshot reads `time_chunk` levels per chunk.
+    """
+    ndim = len(shape) - 1
+    edge = max(1, int((elements / time_chunk) ** (1 / ndim)))
+    return (min(shape[0], time_chunk),) + tuple(min(n, edge) for n in shape[1:])
+
+
+class Result:
+    """
+    Description:
+    ============
+        Solution of a PDE on disk. The time and space grids and the parameters
+        are read when the file is opened, the data is only read when it is
+        sliced.
+
+    Parameters:
+    ============
+        path: [str]
+            Path to a .h5 or .npz file written with Result.write
+
+    Example:
+    ============
+        >>> res = Result('finite_difference_results.h5')
+        >>> res.read(time=(0.0, 1.0), window=[(0.2, 0.4), (0.2, 0.4)])
+        >>> res.probe((0.5, 0.5))
+    """
+
+    def __init__(self, path) -> None:
+        self.path = str(path)
+        if self.path.endswith('.npz'):
+            self._file = np.load(self.path)
+            self.time = self._file['time']
+            self.space = [self._file[axis] for axis in AXES if axis in self._file]
+            self.parameters = json.loads(str(self._file['parameters']))
+        else:
+            self._file = h5py.File(self.path, 'r')
+            self.time = self._file['time'][...]
+            self.space = [self._file['space'][axis][...] for axis in AXES
+                          if axis in self._file['space']]
+            self.parameters = json.loads(self._file.attrs['parameters'])
+        self._data = None
+
+    @staticmethod
+    def write(path, data, time, space, parameters=None, chunks=None, return_result=False):
+        """
+        Description:
+        =============
+            Writes the solution with its grids and parameters. The format is
+            picked from the file name: .npz for NPZ, anything else for HDF5.
+
+        Parameters:
+        =============
+            path: [str]
+                Path of the file to write
+            data: [np.ndarray]
+                Solution with shape (time, x, ...)
+            time: [np.ndarray]
+                Time grid
+            space: [list]
+                List of numpy arrays for each dimension of the space domain
+            parameters: [dict]
+                JSON serializable parameters of the solve
+            chunks: [tuple]
+                HDF5 chunk shape of the data, (time, x, ...). None picks long
+                time chunks with a small block of space, see _chunks.
+            return_result: [bool]
+                Open the written file and return it as a Result. The Result
+                keeps the file open until it is closed, so it has to be closed
+                before the same path is written again.
+
+        Returns:
+        =============
+            Result opened on the written file if return_result, else the path
+        """
+        path = str(path)
+        if data.shape != (len(time),) + tuple(len(axis) for axis in space):
+            raise ValueError('The data does not match the time and space grids!')
+        parameters = json.dumps(parameters or {})
+        if path.endswith('.npz'):
+            grids = {axis: values for axis, values in zip(AXES, space)}
+            np.savez(path, data=data, time=time, parameters=parameters, **grids)
+        else:
+            with h5py.File(path, 'w') as hf:
+                hf.create_dataset('data', data=data, chunks=chunks or _chunks(data.shape))
+                hf.create_dataset('time', data=time)
+                group = hf.create_group('space')
+                for axis, values in zip(AXES, space):
+                    group.create_dataset(axis, data=values)
+                hf.attrs['parameters'] = parameters
+        return Result(path) if return_result else path
+
+    @property
+    def data(self):
+        """
+        Description:
+        =============
+            The data set itself; an h5py dataset that reads on slicing for HDF5
+            files and a numpy array for NPZ files
+        """
+        if self._data is None:
+            self._data = self._file['data']
+        return self._data
+
+    @property
+    def shape(self):
+        return (len(self.time),) + tuple(len(axis) for axis in self.space)
+
+    def _time_index(self, time):
+        if time is None:
+            return slice(None)
+        if isinstance(time, slice):
+            return time
+        start, stop = time
+        return slice(int(np.searchsorted(self.time, start, side='left')),
+                     int(np.searchsorted(self.time, stop, side='right')))
+
+    def _window_index(self, window):
+        if window is None:
+            return tuple(slice(None) for _ in self.space)
+        if len(window) != len(self.space):
+            raise ValueError(f'The window needs {len(self.space)} ranges!')
+        return tuple(slice(int(np.searchsorted(axis, lo, side='left')),
+                           int(np.searchsorted(axis, hi, side='right')))
+                     for axis, (lo, hi) in zip(self.space, window))
+
+    def read(self, time=None, window=None):
+        """
+        Description:
+        =============
+            Reads part of the solution
+
+        Parameters:
+        =============
+            time: [tuple or slice]
+                (start, stop) in physical time, both ends included, or a slice
+                of time levels. None reads all levels.
+            window: [sequence]
+                One (lower, upper) range in physical coordinates per space axis.
+                None reads the whole domain.
+
+        Returns:
+        =============
+            Numpy array with shape (time, x, ...)
+        """
+        return self.data[(self._time_index(time),) + self._window_index(window)]
+
+    def probe(self, point, time=None):
+        """
+        Description:
+        =============
+            Time series at the grid point closest to a location
+
+        Parameters:
+        =============
+            point: [float or sequence]
+                Location in physical coordinates
+            time: [tuple or slice]
+                Time range as for read
+
+        Returns:
+        =============
+            Numpy array with one value per time level
+        """
+        point = np.atleast_1d(point)
+        if len(point) != len(self.space):
+            raise ValueError(f'The probe needs {len(self.space)} coordinates!')
+        index = tuple(int(np.abs(axis - p).argmin()) for axis, p in zip(self.space, point))
+        return self.data[(self._time_index(time),) + index]
+
+    def snapshot(self, t):
+        """
+        Description:
+        =============
+            The whole domain at the time level closest to t
+        """
+        return self.data[int(np.abs(self.time - t).argmin())]
+
+    def close(self):
+        self._data = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
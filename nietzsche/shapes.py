@@ -0,0 +1,254 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+"""
+The shapes module describes regions of the space domain in physical coordinates.
+Shapes are used to set up the initial condition of a PDE without having to work
+out grid indices by hand. Every shape is evaluated on the open (broadcasting)
+grid of the space domain, so no full meshgrid is ever built, and a shape only
+touches the cells that it covers wherever that is possible.
+"""
+
+
+def _as_point(value, ndim, name):
+    """
+    Description:
+    =============
+        Turns a scalar or a sequence into a coordinate tuple with one entry
+        for every dimension of the space domain.
+    """
+    point = np.atleast_1d(np.asarray(value, dtype=float))
+    if point.shape == (1,) and ndim > 1:
+        point = np.repeat(point, ndim)
+    if point.shape != (ndim,):
+        raise ValueError(f'{name} needs {ndim} coordinates, got {point.size}!')
+    return point
+
+
+def _index_window(axis, lower, upper):
+    """
+    Description:
+    =============
+        Slice of the grid points of a monotonic axis that lie within
+        [lower, upper], both ends included.
+    """
+    start = np.searchsorted(axis, lower, side='left')
+    stop = np.searchsorted(axis, upper, side='right')
+    return slice(int(start), int(stop))
+
+
+class Shape(ABC):
+    """
+    Description:
+    ============
+        Base class for a region of the space domain with a value attached
+        to it. Subclasses implement `apply` which writes the shape into a
+        single time level of the primal domain.
+
+    Parameters:
+    ============
+        value: [float]
+            Value that is set inside the shape
+    """
+
+    def __init__(self, value: float = 1.0) -> None:
+        self.value = value
+
+    @abstractmethod
+    def apply(self, field, space):
+        """
+        Description:
+        =============
+            Writes the value of the shape into the field in place
+
+        Parameters:
+        =============
+            field: [np.ndarray]
+                Single time level of the primal domain
+            space: [list]
+                List of numpy arrays for each dimension of the space domain
+
+        Returns:
+        =============
+            None
+        """
+
+
+class MaskedShape(Shape):
+    """
+    Description:
+    ============
+        Shape that sets its value wherever a boolean mask is True.
+        Subclasses implement `mask` which returns a boolean array that
+        broadcasts against the grid window returned by `window`.
+    """
+
+    def window(self, space):
+        """
+        Description:
+        =============
+            Slices of the grid that can contain the shape. By default this is
+            the whole grid.
+        """
+        return tuple(slice(None) for _ in space)
+
+    @abstractmethod
+    def mask(self, grid):
+        """
+        Description:
+        =============
+            Boolean array that is True within the shape
+
+        Parameters:
+        =============
+            grid: [tuple]
+                Open grid of the window as returned by np.ix_
+        """
+
+    def apply(self, field, space):
+        window = self.window(space)
+        grid = np.ix_(*[axis[w] for axis, w in zip(space, window)])
+        np.copyto(field[window], self.value, where=self.mask(grid))
+        return None
+
+
+class Box(Shape):
+    """
+    Description:
+    ============
+        Axis aligned box given by its lower and upper corners
+
+    Parameters:
+    ============
+        lower: [float or sequence]
+            Lower corner of the box in physical coordinates
+        upper: [float or sequence]
+            Upper corner of the box in physical coordinates
+        value: [float]
+            Value that is set inside the box
+
+    Example:
+    ============
+        >>> box = Box(lower=(0.2, 0.2), upper=(0.4, 0.5), value=40.0)
+    """
+
+    def __init__(self, lower, upper, value: float = 1.0) -> None:
+        super().__init__(value)
+        self.lower = lower
+        self.upper = upper
+
+    def window(self, space):
+        lower = _as_point(self.lower, len(space), 'lower')
+        upper = _as_point(self.upper, len(space), 'upper')
+        return tuple(_index_window(axis, lo, hi)
+                     for axis, lo, hi in zip(space, lower, upper))
+
+    def apply(self, field, space):
+        # the box is exactly its window, so no mask is needed
+        field[self.window(space)] = self.value
+        return None
+
+
+class Sphere(MaskedShape):
+    """
+    Description:
+    ============
+        Ball (interval in 1D, disc in 2D) given by its center and radius
+
+    Parameters:
+    ============
+        center: [float or sequence]
+            Center of the sphere in physical coordinates
+        radius: [float]
+            Radius of the sphere
+        value: [float]
+            Value that is set inside the sphere
+
+    Example:
+    ============
+        >>> sphere = Sphere(center=(0.5, 0.5, 0.5), radius=0.1, value=4.0)
+    """
+
+    def __init__(self, center, radius: float, value: float = 1.0) -> None:
+        super().__init__(value)
+        self.center = center
+        self.radius = radius
+
+    def window(self, space):
+        center = _as_point(self.center, len(space), 'center')
+        return tuple(_index_window(axis, c - self.radius, c + self.radius)
+                     for axis, c in zip(space, center))
+
+    def mask(self, grid):
+        center = _as_point(self.center, len(grid), 'center')
+        distance = sum((g - c)**2 for g, c in zip(grid, center))
+        return distance <= self.radius**2
+
+
+class Gaussian(Shape):
+    """
+    Description:
+    ============
+        Gaussian bump that is added on top of the field. The bump is
+        separable, so it is evaluated as an outer product of one
+        dimensional profiles.
+
+    Parameters:
+    ============
+        center: [float or sequence]
+            Center of the bump in physical coordinates
+        width: [float or sequence]
+            Standard deviation of the bump along each axis
+        value: [float]
+            Amplitude of the bump
+
+    Example:
+    ============
+        >>> bump = Gaussian(center=0.5, width=0.05, value=10.0)
+    """
+
+    def __init__(self, center, width, value: float = 1.0) -> None:
+        super().__init__(value)
+        self.center = center
+        self.width = width
+
+    def apply(self, field, space):
+        center = _as_point(self.center, len(space), 'center')
+        width = _as_point(self.width, len(space), 'width')
+        grid = np.ix_(*space)
+        bump = self.value
+        for g, c, w in zip(grid, center, width):
+            bump = bump * np.exp(-0.5*((g - c)/w)**2)
+        field += bump
+        return None
+
+
+class Mask(MaskedShape):
+    """
+    Description:
+    ============
+        Arbitrary region given either by a boolean array with the shape of
+        the grid, or by a callable that takes the open grid coordinates
+        (x, y, z) and returns a boolean array.
+
+    Parameters:
+    ============
+        mask: [np.ndarray or callable]
+            Boolean mask or function of the coordinates
+        value: [float]
+            Value that is set inside the region
+
+    Example:
+    ============
+        >>> ring = Mask(lambda x, y: (x**2 + y**2 > 0.1) & (x**2 + y**2 < 0.2), value=1.0)
+    """
+
+    def __init__(self, mask, value: float = 1.0) -> None:
+        super().__init__(value)
+        self.region = mask
+
+    def mask(self, grid):
+        if callable(self.region):
+            return self.region(*grid)
+        return np.asarray(self.region, dtype=bool)
@@ -0,0 +1,486 @@
+import functools
+import itertools
+import math
+
+import numpy as np
+
+"""
+The stencil module holds the finite difference kernels used by the PDE solvers.
+Kernels work on a single time level at a time and only ever write the interior
+of the destination, i.e. every cell that is not on the edge of the array. This
+means a kernel can be run on any rectangular view of the domain as long as the
+view carries one extra cell on each side as a halo.
+"""
+
+
+def interior(ndim, width=1):
+    """
+    Description:
+    =============
+        Tuple of slices that selects the interior of an ndim array, leaving
+        out `width` cells on every side.
+    """
+    return (slice(width, -width),) * ndim
+
+
+def shifted(ndim, axis, offset, width=1):
+    """
+    Description:
+    =============
+        Tuple of slices that selects the interior of an ndim array shifted by
+        `offset` cells along `axis`.
+    """
+    slices = [slice(width, -width)] * ndim
+    stop = -width + offset
+    slices[axis] = slice(width + offset, stop if stop != 0 else None)
+    return tuple(slices)
+
+
+# central difference weights of the second derivative, center first
+COEFFICIENTS = {2: (-2.0, 1.0),
+                4: (-5/2, 4/3, -1/12),
+                6: (-49/18, 3/2, -3/20, 1/90)}
+
+
+def stable_step_constant(ndim, order=2):
+    """
+    Description:
+    =============
+        Largest step constant D*dt/dx^2 for which the forward Euler step with
+        the central Laplacian of the given order is stable, i.e. 2 over the
+        spectral radius of the stencil: 1/(2*ndim) for second order,
+        3/(8*ndim) for fourth and 45/(136*ndim) for sixth order. The one
+        sided boundary closures of the higher orders stay stable up to the
+        same limit.
+    """
+    if order not in COEFFICIENTS:
+        raise ValueError(f'There is no stencil of order {order}!')
+    weights = COEFFICIENTS[order]
+    radius = -(weights[0] + 2*sum(w * (-1)**j for j, w in enumerate(weights[1:], 1)))
+    return 2 / (ndim * radius)
+
+
+def _one_sided(position, points):
+    """
+    Description:
+    =============
+        Weights of the second derivative at `position` from the values at the
+        grid points 0 .. points-1, exact for polynomials up to degree points-1.
+    """
+    offsets = np.arange(points) - position
+    taylor = np.array([offsets**k / math.factorial(k) for k in range(points)])
+    rhs = np.zeros(points)
+    rhs[2] = 1.0
+    return np.linalg.solve(taylor, rhs)
+
+
+# boundary closures of the high order stencils: for the points 1 .. half-1 next to
+# the edge, one sided weights over the first CLOSURE_POINTS points, which are
+# fourth order accurate. Wider, sixth order closures make the operator non normal
+# with complex eigenvalues that the Runge-Kutta-Legendre schemes can not damp;
+# with six points the spectrum stays real and negative, and a closure two orders
+# below the interior on a fixed number of rows still gives a sixth order solution.
+CLOSURE_POINTS = 6
+CLOSURES = {order: [_one_sided(i, CLOSURE_POINTS) for i in range(1, len(weights) - 1)]
+            for order, weights in COEFFICIENTS.items()}
+
+
+@functools.lru_cache(maxsize=32)
+def _plan(shape, order):
+    """
+    Description:
+    =============
+        Precomputed terms of the high order Laplacian of an array of the given
+        shape: the weight of the center summed over the axes, the central terms
+        (target, weight, plus, minus) that add weight * (u[plus] + u[minus]) to
+        the target slice of the output on the bulk of an axis, and the closure
+        terms (target, weights, source, axis) that add the matrix product of the
+        one sided weights with the first (or last) CLOSURE_POINTS points of an
+        axis.
+        Axes that are too short for the closures use a lower order.
+    """
+    ndim = len(shape)
+    center = 0.0
+    central = []
+    closures = []
+    for axis, n in enumerate(shape):
+        q = order
+        while q > 2 and n < max(2*len(COEFFICIENTS[q]) - 1, CLOSURE_POINTS):
+            q -= 2
+        weights = COEFFICIENTS[q]
+        half = len(weights) - 1
+        center += weights[0]
+
+        def along(start, stop, base=1):
+            # points start .. stop-1 of the axis, in the output (base 1, the
+            # output starts at u point 1) or in u itself (base 0)
+            slices = [slice(None) if base else slice(1, -1)] * ndim
+            slices[axis] = slice(start - base, stop - base)
+            return tuple(slices)
+
+        for j, w in enumerate(weights[1:], 1):
+            central.append((along(half, n - half), w,
+                            along(half + j, n - half + j, 0), along(half - j, n - half - j, 0)))
+        if q > 2:
+            # the center weight is already in, the closure only adds the difference
+            matrix = np.array(CLOSURES[q])
+            matrix[np.arange(half - 1), np.arange(1, half)] -= weights[0]
+            closures.append((along(1, half), matrix.T, along(0, CLOSURE_POINTS, 0), axis))
+            closures.append((along(n - half, n - 1), matrix[::-1, ::-1].T,
+                             along(n - CLOSURE_POINTS, n, 0), axis))
+    return center, central, closures
+
+
+def _high_order_laplacian(u, out, work, order):
+    center, central, closures = _plan(u.shape, order)
+    np.multiply(u[interior(u.ndim)], center, out=out)
+    for target, w, plus, minus in central:
+        scratch = work[target]
+        np.add(u[plus], u[minus], out=scratch)
+        np.multiply(scratch, w, out=scratch)
+        out[target] += scratch
+    for target, weights, source, axis in closures:
+        np.matmul(np.moveaxis(u[source], axis, -1), weights,
+                  out=np.moveaxis(work[target], axis, -1))
+        out[target] += work[target]
+    return out
+
+
+def _neighbour_sum(u, out):
+    # sum of the 2*ndim nearest neighbours of the interior points
+    ndim = u.ndim
+    np.add(u[shifted(ndim, 0, 1)], u[shifted(ndim, 0, -1)], out=out)
+    for axis in range(1, ndim):
+        np.add(out, u[shifted(ndim, axis, 1)], out=out)
+        np.add(out, u[shifted(ndim, axis, -1)], out=out)
+    return out
+
+
+def laplacian(u, out=None, work=None, order=2):
+    """
+    Description:
+    =============
+        Discrete Laplacian of u on its interior, without the 1/dx^2 scaling.
+        The second order stencil is the 3, 5 or 7-point one. The fourth and
+        sixth order stencils are 5 and 7 points wide along each axis; next to
+        the edge they switch to fourth order one sided closures, see
+        CLOSURES, so only the edge values are needed as boundary condition.
+
+    Parameters:
+    =============
+        u: [np.ndarray]
+            Field of any dimension
+        out: [np.ndarray]
+            Optional array with the shape of the interior of u for the result
+        work: [np.ndarray]
+            Optional scratch array with the shape of the interior of u
+        order: [int]
+            Order of accuracy of the stencil, 2, 4 or 6
+
+    Returns:
+    =============
+        Array with the shape of the interior of u
+    """
+    ndim = u.ndim
+    center = u[interior(ndim)]
+    if out is None:
+        out = np.empty(center.shape, dtype=u.dtype)
+    if order not in COEFFICIENTS:
+        raise ValueError(f'There is no stencil of order {order}!')
+    if work is None:
+        work = np.empty(center.shape, dtype=u.dtype)
+    if order != 2:
+        return _high_order_laplacian(u, out, work, order)
+    _neighbour_sum(u, out)
+    np.multiply(center, 2*ndim, out=work)
+    np.subtract(out, work, out=out)
+    return out
+
+
+def explicit_step(src, dst, step_constant, out=None, work=None, order=2):
+    """
+    Description:
+    =============
+        Forward Euler step of the diffusion equation. The interior of dst is
+        set to src + step_constant * laplacian(src); the edge of dst is left
+        as it is, so boundary values set on dst are kept.
+
+    Parameters:
+    =============
+        src: [np.ndarray]
+            Field at the current time level
+        dst: [np.ndarray]
+            Field at the next time level, same shape as src
+        step_constant: [float]
+            D*dt/dx^2 of the explicit scheme
+        out, work: [np.ndarray]
+            Optional scratch arrays with the shape of the interior of src
+        order: [int]
+            Order of accuracy of the Laplacian, see laplacian
+
+    Returns:
+    =============
+        None
+    """
+    lap = laplacian(src, out=out, work=work, order=order)
+    np.multiply(lap, step_constant, out=lap)
+    np.add(lap, src[interior(src.ndim)], out=dst[interior(dst.ndim)])
+    return None
+
+
+def _tiles(n, size):
+    return [(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+def cache_block(shape, time_block=2, itemsize=8, cache_bytes=2**20):
+    """
+    Description:
+    =============
+        Cube tiles for blocked_solve such that the scratch buffers of one tile
+        (two field buffers with their halo, out and work) fit into
+        `cache_bytes`. Every axis is blocked with the same edge length.
+    """
+    cells = cache_bytes / (4 * itemsize)
+    # the small offset keeps exact roots such as 32768 ** (1/3) from rounding down
+    edge = int(cells ** (1 / len(shape)) + 1e-9) - 2*time_block
+    return tuple(min(max(edge, 1), n) for n in shape)
+
+
+# default tiles of blocked_solve: slabs of this many cells along x
+SLAB = 8
+
+
+def _block_shape(shape, block, time_block, itemsize, cache_bytes):
+    if block is None:
+        block = SLAB
+    if isinstance(block, str):
+        if block != 'cube':
+            raise ValueError(f'Unknown block {block}!')
+        return cache_block(shape, time_block, itemsize, cache_bytes)
+    if np.ndim(block) == 0:
+        return (block,) + (None,) * (len(shape) - 1)
+    return tuple(block)
+
+
+def blocked_solve(history, step_constant, block=None, time_block=1, nsteps=None,
+                  callback=None, cache_bytes=2**20):
+    """
+    Description:
+    =============
+        Explicit solve over the time levels of history with cache and temporal
+        blocking. The domain is cut into tiles of `block` cells. Each
+        tile is copied together with a halo of `time_block` cells into a small
+        scratch buffer and advanced `time_block` steps there before moving on to
+        the next tile, so a time level is streamed from memory once every
+        `time_block` steps instead of once per step. The halo shrinks by one cell
+        per step, which is why the overlap equals `time_block`. Cells on the
+        edge of the domain keep the values that are preset in history, exactly
+        like explicit_step, and the result is identical to stepping the whole
+        array one level at a time. When history holds fewer levels than there
+        are time steps it is used as a ring buffer, time step k living in level
+        k % len(history), which needs more levels than `time_block`.
+        With numpy as the inner kernel every tile and step costs a few dozen
+        numpy calls. The default, slabs of SLAB cells along x advanced one step
+        at a time, keeps the temporaries of a slab in cache and measures about
+        1.05 to 1.2 times faster than the full array kernel on 120^3 to 160^3
+        grids; cube tiles and longer time blocks were slower than the full
+        array kernel there, see benchmarks/stencil_blocking.py.
+
+    Parameters:
+    =============
+        history: [np.ndarray]
+            Array of shape (time, x, ...) with the initial and boundary values set.
+            It is updated in place.
+        step_constant: [float]
+            D*dt/dx^2 of the explicit scheme
+        block: [int, sequence or str]
+            Tile size per space axis, None within a sequence keeps that axis
+            whole. A single int cuts slabs along x, None uses slabs of SLAB
+            cells and 'cube' cube tiles sized by cache_block so that the
+            scratch of a tile fits into `cache_bytes`.
+        time_block: [int]
+            Number of time steps advanced per tile
+        nsteps: [int]
+            Number of time steps, defaults to len(history) - 1
+        callback: [callable]
+            Called as callback(k, field) for every completed time step k
+        cache_bytes: [int]
+            Cache budget of the 'cube' tiles
+
+    Returns:
+    =============
+        None
+    """
+    shape = history.shape[1:]
+    ndim = len(shape)
+    block = _block_shape(shape, block, time_block, history.itemsize, cache_bytes)
+    levels = history.shape[0]
+    if nsteps is None:
+        nsteps = levels - 1
+    if len(block) != ndim or time_block < 1 or time_block >= levels:
+        raise ValueError('Could not set the blocks for the solve!')
+    block = tuple(n if b is None else min(int(b), n) for b, n in zip(block, shape))
+    region_max = tuple(min(b + 2*time_block, n) for b, n in zip(block, shape))
+    # scratch buffers reused by every tile
+    buffers = [np.zeros(region_max, dtype=history.dtype) for _ in range(2)]
+    inner_max = tuple(max(m - 2, 0) for m in region_max)
+    out = np.empty(inner_max, dtype=history.dtype)
+    work = np.empty(inner_max, dtype=history.dtype)
+    tiles = [_tiles(n, b) for n, b in zip(shape, block)]
+    k = 0
+    while k < nsteps:
+        steps = min(time_block, nsteps - k)
+        for tile in itertools.product(*tiles):
+            region = tuple(slice(max(a - steps, 0), min(b + steps, n))
+                           for (a, b), n in zip(tile, shape))
+            extent = tuple(r.stop - r.start for r in region)
+            local = tuple(slice(0, m) for m in extent)
+            inner = tuple(slice(0, max(m - 2, 0)) for m in extent)
+            own = tuple(slice(a - r.start, b - r.start) for (a, b), r in zip(tile, region))
+            current, following = buffers[0][local], buffers[1][local]
+            current[...] = history[k % levels][region]
+            for s in range(1, steps + 1):
+                explicit_step(current, following, step_constant,
+                              out=out[inner], work=work[inner])
+                # the edge of the domain keeps the values preset at level k+s
+                for axis, (r, n) in enumerate(zip(region, shape)):
+                    for face, edge in ((0, r.start == 0), (-1, r.stop == n)):
+                        if edge:
+                            index = (slice(None),) * axis + (face,)
+                            src = list(region)
+                            src[axis] = face if face == 0 else n - 1
+                            following[index] = history[(k + s) % levels][tuple(src)]
+                history[(k + s) % levels][tuple(slice(a, b) for a, b in tile)] = following[own]
+                current, following = following, current
+        if callback is not None:
+            for s in range(1, steps + 1):
+                callback(k + s, history[(k + s) % levels])
+        k += steps
+    return None
+
+
+def super_step_factor(stages, scheme='rkl2'):
+    """
+    Description:
+    =============
+        How many times larger than the forward Euler limit the step constant
+        of one Runge-Kutta-Legendre super step with `stages` stages can be:
+        (s^2+s)/2 for the first order RKL1 and (s^2+s-2)/4 for the second
+        order RKL2 scheme.
+    """
+    if scheme == 'rkl1':
+        return (stages**2 + stages) / 2
+    if scheme == 'rkl2':
+        return (stages**2 + stages - 2) / 4
+    raise ValueError(f'There is no super time stepping scheme called {scheme}!')
+
+
+def super_stages(step_constant, limit, scheme='rkl2'):
+    """
+    Description:
+    =============
+        Smallest number of stages for which a super step with the given step
+        constant is stable, `limit` being the forward Euler limit
+    """
+    stages = 1 if scheme == 'rkl1' else 2
+    while limit * super_step_factor(stages, scheme) < step_constant:
+        stages += 1
+    return stages
+
+
+def rkl_step(src, dst, step_constant, stages, scheme='rkl2', order=2, buffers=None,
+             scratch=None):
+    """
+    Description:
+    =============
+        One Runge-Kutta-Legendre super time step of the diffusion equation
+        (Meyer, Balsara and Aslam 2014). The step is built from `stages`
+        applications of the explicit Laplacian and is stable for step
+        constants up to super_step_factor(stages) times the forward Euler
+        limit, so a long diffusion time needs about stages/2 (RKL1) or
+        stages/4 (RKL2) times fewer stencil applications than forward Euler.
+        Like explicit_step only the interior of dst is written and the edge
+        values of src are used as boundary values during the stages.
+        The stages are run on their difference to src, which has zero edges,
+        so the Laplacian of src is only taken once per super step, and they
+        are summed in contiguous scratch arrays instead of interior views.
+        RKL2 damps grid scale modes only weakly, so very rough data is
+        better started with a few forward Euler or RKL1 steps.
+
+    Parameters:
+    =============
+        src: [np.ndarray]
+            Field at the current time level
+        dst: [np.ndarray]
+            Field at the next time level, same shape as src
+        step_constant: [float]
+            D*dt/dx^2 of the super step
+        stages: [int]
+            Number of stages, see super_stages
+        scheme: [str]
+            rkl1 for the first or rkl2 for the second order scheme
+        order: [int]
+            Order of accuracy of the Laplacian, see laplacian
+        buffers: [list]
+            Optional list of three scratch arrays with the shape of src. Only
+            their edges are set here, so they can be reused from step to step.
+        scratch: [list]
+            Optional list of three scratch arrays with the shape of the
+            interior of src
+
+    Returns:
+    =============
+        None
+    """
+    if stages < (1 if scheme == 'rkl1' else 2):
+        raise ValueError(f'The {scheme} scheme needs more stages!')
+    ndim = src.ndim
+    inside = interior(ndim)
+    if buffers is None:
+        buffers = [np.empty_like(src) for _ in range(3)]
+    if scratch is None:
+        scratch = [np.empty(src[inside].shape, dtype=src.dtype) for _ in range(3)]
+    total, lap0, work = scratch
+    for buffer in buffers:
+        # the differences to src vanish on the edge
+        for axis in range(ndim):
+            for face in (0, -1):
+                buffer[(slice(None),) * axis + (face,)] = 0.0
+    w1 = 2 / (stages**2 + stages) if scheme == 'rkl1' else 4 / (stages**2 + stages - 2)
+    if scheme == 'rkl2':
+        b = [1/3, 1/3, 1/3] + [(j**2 + j - 2) / (2*j*(j + 1)) for j in range(3, stages + 1)]
+    # step constant times the Laplacian of src, kept for all stages
+    laplacian(src, out=lap0, work=work, order=order)
+    np.multiply(lap0, step_constant, out=lap0)
+    # first stage, the difference d_1 = mu_1 * lap0
+    np.multiply(lap0, w1 if scheme == 'rkl1' else b[1] * w1, out=total)
+    previous2, previous = None, buffers[1]
+    for j in range(2, stages + 1):
+        previous[inside] = total
+        if scheme == 'rkl1':
+            mu = (2*j - 1) / j
+            nu = (1 - j) / j
+            scale = mu * w1
+            source = scale
+        else:
+            mu = (2*j - 1) / j * b[j] / b[j - 1]
+            nu = -(j - 1) / j * b[j] / b[j - 2]
+            scale = mu * w1
+            source = scale - (1 - b[j - 1]) * scale
+        # d_j = mu d_{j-1} + nu d_{j-2} + scale * step_constant * L(d_{j-1}) + source * lap0
+        if order == 2:
+            # the center of the second order stencil is folded into the mu term
+            _neighbour_sum(previous, total)
+            mu = mu - 2*ndim * scale * step_constant
+        else:
+            laplacian(previous, out=total, work=work, order=order)
+        np.multiply(total, scale * step_constant, out=total)
+        terms = [(mu, previous[inside]), (source, lap0)]
+        if previous2 is not None:
+            terms.append((nu, previous2[inside]))
+        for weight, term in terms:
+            np.multiply(term, weight, out=work)
+            np.add(total, work, out=total)
+        previous2, previous = previous, buffers[j % 3]
+    np.add(total, src[inside], out=dst[inside])
+    return None
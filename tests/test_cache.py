@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pytest
+from nietzsche.cache import SolveCache
+from nietzsche.pde import Diffusion
+from nietzsche.shapes import Box
+from nietzsche.space import Space
+from nietzsche.time_ import Time
+from nietzsche.utils import Dimension
+
+def make_diffusion(value=10.0):
+    diff = Diffusion()
+    diff.set_primal_domain(space_array=Space(dimension=Dimension.DD.value).setup(x_step=15, y_step=15),
+                           time_array=Time().setup(step=20))
+    diff.set_initial_condition(0.0, Box(lower=0.4, upper=0.6, value=value))
+    return diff
+
+class TestSolveCache:
+
+    def test_hit_and_miss(self, tmp_path):
+        cache = SolveCache(tmp_path)
+        first = cache.solve(make_diffusion(), 0.2)
+        again = make_diffusion()
+        second = cache.solve(again, 0.2, workers=2)
+        assert cache.stats == {'hits': 1, 'misses': 1, 'evictions': 0}
+        # the solve was skipped
+        assert not again.primal_domain[-1].any()
+        assert np.array_equal(first.read(), second.read())
+        cache.solve(make_diffusion(), 0.1)
+        cache.solve(make_diffusion(value=5.0), 0.2)
+        assert cache.misses == 3
+
+    def test_eviction(self, tmp_path):
+        cache = SolveCache(tmp_path, max_bytes=1)
+        cache.solve(make_diffusion(), 0.2).close()
+        cache.solve(make_diffusion(), 0.1).close()
+        assert cache.evictions == 1
+        assert len(os.listdir(tmp_path)) == 1
+        cache.solve(make_diffusion(), 0.1)
+        assert cache.hits == 1
+
+    def test_history_required(self, tmp_path):
+        diff = Diffusion()
+        diff.set_primal_domain(space_array=Space().setup(), time_array=Time().setup(),
+                               store_history=False)
+        with pytest.raises(ValueError):
+            SolveCache(tmp_path).solve(diff, 0.2)
+
+    def test_key_normalizes_options(self):
+        diff = make_diffusion()
+        key = SolveCache.key(diff, 0.2)
+        assert SolveCache.key(diff, 0.2, order=2, scheme='euler') == key
+        assert SolveCache.key(diff, step_constant=0.2, stages=None) == key
+        assert SolveCache.key(diff, 0.2, block='auto', time_block=3) == key
+        assert SolveCache.key(diff, 0.2, order=4) != key
+        with pytest.raises(TypeError):
+            SolveCache.key(diff, 0.2, ordr=4)
@@ -0,0 +1,26 @@
+import pytest
+from nietzsche.convergence import convergence_study
+
+class TestConvergence:
+
+    def test_fixed_step_constant_is_second_order(self):
+        rows = convergence_study(orders=(2, 4, 6), resolutions=(21, 41))
+        by_run = {(row['order'], row['points']): row for row in rows}
+        for order in (2, 4, 6):
+            row = by_run[(order, 41)]
+            assert row['error'] <= row['time_error'] + row['space_error']
+            # the forward Euler time error caps every order at second order
+            assert row['rate'] == pytest.approx(2, abs=0.2)
+            assert row['space_rate'] > order - 0.3
+        # so the higher orders are no more accurate on the same grid
+        assert by_run[(4, 41)]['error'] > by_run[(2, 41)]['error'] / 10
+
+    def test_scaled_step_constant(self):
+        rows = convergence_study(orders=(2, 4, 6), resolutions=(21, 41), scale_step=True)
+        by_run = {(row['order'], row['points']): row for row in rows}
+        for order in (2, 4, 6):
+            assert by_run[(order, 41)]['rate'] == pytest.approx(order, abs=0.3)
+        # the accuracy is paid for with smaller time steps
+        assert by_run[(4, 41)]['error'] < by_run[(2, 41)]['error'] / 10
+        assert by_run[(4, 41)]['cost'] > by_run[(2, 41)]['cost']
+        assert by_run[(6, 41)]['error'] < by_run[(4, 41)]['error']
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from nietzsche.diagnostics import Diagnostics
+
+class TestDiagnostics:
+
+    def setup_method(self):
+        self.space = [np.linspace(0, 1, 5), np.linspace(0, 1, 11)]
+        self.time = np.linspace(0, 1, 10)
+
+    def test_sampling(self):
+        diag = Diagnostics(every=3)
+        diag.add_reduction('mass')
+        diag.add_reduction('max')
+        diag.add_reduction('custom', lambda u: u[0, 0])
+        diag.add_probe('sensor', (0.5, 0.3))
+        diag.add_slice('mid', axis=1, position=0.5)
+        diag.setup(self.space, self.time)
+        assert np.array_equal(diag.time, self.time[[0, 3, 6, 9]])
+        for k in range(10):
+            diag.sample(k, np.full((5, 11), float(k)))
+        assert np.allclose(diag.values['mass'], [0.0, 3*55*0.25*0.1, 6*55*0.25*0.1, 9*55*0.25*0.1])
+        assert np.array_equal(diag.values['max'], [0, 3, 6, 9])
+        assert np.array_equal(diag.values['custom'], [0, 3, 6, 9])
+        assert np.array_equal(diag.values['sensor'], [0, 3, 6, 9])
+        assert diag.values['mid'].shape == (4, 5)
+
+    def test_unknown_reduction(self):
+        diag = Diagnostics()
+        diag.add_reduction('median')
+        with pytest.raises(ValueError):
+            diag.setup(self.space, self.time)
+
+    def test_duplicate_name(self):
+        diag = Diagnostics()
+        diag.add_reduction('max')
+        with pytest.raises(ValueError):
+            diag.add_probe('max', (0.5, 0.5))
+        with pytest.raises(ValueError):
+            diag.add_slice('max', axis=0, position=0.5)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from nietzsche.parallel import decompose, solve_decomposed
+from nietzsche.stencil import explicit_step
+
+class TestParallel:
+
+    def test_decompose(self):
+        slabs = decompose(12, 3)
+        assert slabs[0][0] == 1 and slabs[-1][1] == 11
+        assert all(a[1] == b[0] for a, b in zip(slabs[:-1], slabs[1:]))
+        assert len(decompose(4, 8)) == 2
+
+    @pytest.mark.parametrize("shape", [(20, 30), (10, 16, 12), (6, 10, 9, 8)])
+    def test_matches_serial(self, shape):
+        primal = np.zeros(shape)
+        primal[0] = np.random.rand(*shape[1:])
+        expected = primal.copy()
+        for k in range(shape[0] - 1):
+            explicit_step(expected[k], expected[k + 1], 0.1)
+        solve_decomposed(primal, 0.1, workers=3)
+        assert np.array_equal(primal, expected)
+
+    def test_boundary_levels_and_ring_buffer(self):
+        primal = np.zeros((8, 12, 10))
+        primal[0] = np.random.rand(12, 10)
+        # boundary values that change from level to level
+        for k in range(8):
+            primal[k, 0] = k
+            primal[k, :, -1] = -k
+        expected = primal.copy()
+        for k in range(7):
+            explicit_step(expected[k], expected[k + 1], 0.1)
+        solve_decomposed(primal, 0.1, workers=3)
+        assert np.array_equal(primal, expected)
+
+    def test_ring_buffer_callback(self):
+        full = np.zeros((8, 12, 10))
+        full[0, 1:-1, 1:-1] = np.random.rand(10, 8)
+        expected = full.copy()
+        for k in range(7):
+            explicit_step(expected[k], expected[k + 1], 0.1)
+        ring = full[:2].copy()
+        seen = []
+        solve_decomposed(ring, 0.1, workers=2, nsteps=7,
+                         callback=lambda k, field: seen.append((k, field.copy())))
+        assert [k for k, _ in seen] == list(range(1, 8))
+        assert all(np.array_equal(field, expected[k]) for k, field in seen)
+        assert np.array_equal(ring[1], expected[7])
+
+    def test_killed_worker(self, monkeypatch):
+        import os
+        import signal
+        from nietzsche import parallel
+
+        def dying_worker(*args):
+            os.kill(os.getpid(), signal.SIGKILL)
+
+        monkeypatch.setattr(parallel, '_worker', dying_worker)
+        primal = np.zeros((5, 10, 10))
+        with pytest.raises(RuntimeError):
+            solve_decomposed(primal, 0.1, workers=2)
@@ -1,3 +1,5 @@
+import asyncio
+import threading
 import pytest
 import numpy as np
 import matplotlib.pyplot as plt
@@ -6,6 +8,212 @@ from nietzsche.pde import Diffusion
 from nietzsche.space import Space
 from nietzsche.time_ import Time
 from nietzsche.utils import Dimension
+from nietzsche.shapes import Box, Sphere
+from nietzsche.diagnostics import Diagnostics
+
+class TestInitialCondition:
+
+    def setup_method(self):
+        self.time = Time().setup(step=5)
+
+    def test_initial_condition_1d_sets_first_level_only(self):
+        diff = Diffusion()
+        diff.set_primal_domain(space_array=Space().setup(x_step=20), time_array=self.time)
+        diff.initial_condition(0.0, 1.0, 5, 10, None, None, None, None)
+        assert np.all(diff.primal_domain[0, 5:10] == 1.0)
+        assert np.all(diff.primal_domain[1:] == 0.0)
+
+    def test_set_initial_condition_shapes(self):
+        s = Space(dimension=Dimension.DDD.value)
+        diff = Diffusion()
+        diff.set_primal_domain(space_array=s.setup(x_step=11, y_step=11, z_step=11),
+                               time_array=self.time)
+        diff.set_initial_condition(1.0,
+                                   Box(lower=0.0, upper=0.2, value=4.0),
+                                   Sphere(center=(0.5, 0.5, 0.5), radius=0.15, value=2.0))
+        assert np.all(diff.primal_domain[0, :3, :3, :3] == 4.0)
+        assert diff.primal_domain[0, 5, 5, 5] == 2.0
+        assert diff.primal_domain[0, 9, 9, 9] == 1.0
+        assert np.all(diff.primal_domain[1:] == 0.0)
+
+class TestSolve:
+
+    def make_diffusion(self, store_history=True, levels=2):
+        s = Space(dimension=Dimension.DD.value)
+        diff = Diffusion()
+        diff.set_primal_domain(space_array=s.setup(x_step=21, y_step=21),
+                               time_array=Time().setup(step=30),
+                               store_history=store_history, levels=levels)
+        diff.set_initial_condition(0.0, Sphere(center=(0.5, 0.5), radius=0.2, value=10.0))
+        diff.primal_domain = diff.boundary_condition(diff.primal_domain,
+                                                     constant_value=0.0,
+                                                     thickness=1)
+        return diff
+
+    def test_solve_workers_matches_serial(self):
+        serial = self.make_diffusion()
+        serial.solve(step_constant=0.2)
+        parallel = self.make_diffusion()
+        parallel.solve(step_constant=0.2, workers=2)
+        assert np.array_equal(serial.primal_domain, parallel.primal_domain)
+        assert serial.primal_domain[-1].sum() < serial.primal_domain[0].sum()
+
+    def test_solve_blocked_matches_serial(self):
+        serial = self.make_diffusion()
+        serial.solve(step_constant=0.2)
+        blocked = self.make_diffusion()
+        blocked.solve(step_constant=0.2, block=5, time_block=3)
+        assert np.array_equal(serial.primal_domain, blocked.primal_domain)
+        with pytest.raises(ValueError):
+            blocked.solve(step_constant=0.2, workers=2, block=5)
+
+    @pytest.mark.parametrize("options", [{}, {'workers': 2}, {'block': 4, 'time_block': 1}])
+    def test_solve_without_history(self, options):
+        full = self.make_diffusion()
+        full.solve(step_constant=0.2)
+        diag = Diagnostics(every=4)
+        diag.add_reduction('max')
+        diag.add_probe('center', (0.5, 0.5))
+        light = self.make_diffusion(store_history=False)
+        light.solve(step_constant=0.2, diagnostics=diag, **options)
+        assert light.primal_domain.shape[0] == 2
+        assert np.array_equal(light.time_level(-1), full.primal_domain[-1])
+        assert np.array_equal(diag.values['max'], full.primal_domain[::4].max(axis=(1, 2)))
+        assert np.array_equal(diag.values['center'], full.primal_domain[::4, 10, 10])
+
+    def test_solve_without_history_blocked(self):
+        full = self.make_diffusion()
+        full.solve(step_constant=0.2)
+        light = self.make_diffusion(store_history=False)
+        light.solve(step_constant=0.2, block='auto')
+        assert np.array_equal(light.time_level(-1), full.primal_domain[-1])
+        light = self.make_diffusion(store_history=False)
+        with pytest.raises(ValueError, match='levels=3'):
+            light.solve(step_constant=0.2, block='cube', time_block=2)
+        light = self.make_diffusion(store_history=False, levels=3)
+        light.solve(step_constant=0.2, block='cube', time_block=2)
+        assert np.array_equal(light.time_level(-1), full.primal_domain[-1])
+
+    def test_solve_order(self):
+        diff = self.make_diffusion()
+        diff.solve(step_constant=0.15, order=4)
+        assert diff.primal_domain[-1].sum() < diff.primal_domain[0].sum()
+        with pytest.raises(ValueError):
+            diff.solve(step_constant=0.2, order=4)
+        with pytest.raises(ValueError):
+            diff.solve(step_constant=0.1, order=4, workers=2)
+
+    def test_solve_super_time_stepping(self):
+        s = Space(dimension=Dimension.DD.value)
+        sp = s.setup(x_step=21, y_step=21)
+        t = Time().setup(step=41)
+        mode = 10.0 * np.sin(np.pi * sp[0])[:, None] * np.sin(np.pi * sp[1])[None, :]
+        euler = Diffusion()
+        euler.set_primal_domain(space_array=sp, time_array=t)
+        euler.primal_domain[0] = mode
+        euler.solve(step_constant=0.2)
+        # one super step spans ten forward Euler steps
+        diff = Diffusion()
+        diff.set_primal_domain(space_array=sp, time_array=t[::10])
+        diff.primal_domain[0] = mode
+        diff.solve(step_constant=2.0, scheme='rkl2')
+        assert np.abs(diff.primal_domain[-1] - euler.primal_domain[40]).max() < 0.05
+        with pytest.raises(ValueError):
+            diff.solve(step_constant=2.0, scheme='rkl2', stages=3)
+        with pytest.raises(ValueError):
+            diff.solve(step_constant=2.0, scheme='rkl2', workers=2)
+
+    @pytest.mark.parametrize("scheme", ["rkl1", "rkl2"])
+    @pytest.mark.parametrize("points", [21, 41])
+    def test_solve_super_time_stepping_sixth_order(self, scheme, points):
+        # the boundary closures must not drive the super steps unstable
+        s = Space(dimension=Dimension.DD.value)
+        diff = Diffusion()
+        diff.set_primal_domain(space_array=s.setup(x_step=points, y_step=points),
+                               time_array=Time().setup(step=40))
+        diff.set_initial_condition(0.0, Sphere(center=(0.5, 0.5), radius=0.2, value=10.0))
+        for step_constant in (5.0, 20.0):
+            diff.solve(step_constant=step_constant, order=6, scheme=scheme)
+            assert np.all(np.isfinite(diff.primal_domain[-1]))
+            assert np.abs(diff.primal_domain[-1]).max() < 1.0
+
+    def test_iter_solve_matches_solve(self):
+        full = self.make_diffusion()
+        full.solve(step_constant=0.2)
+        diff = self.make_diffusion(store_history=False)
+        snapshots = list(diff.iter_solve(step_constant=0.2, every=7))
+        assert [snap.step for snap in snapshots] == [0, 7, 14, 21, 28, 29]
+        for snap in snapshots:
+            assert snap.time == full.time[snap.step]
+            assert np.array_equal(snap.field, full.primal_domain[snap.step])
+
+    def test_aiter_solve(self):
+        full = self.make_diffusion()
+        full.solve(step_constant=0.2)
+        diff = self.make_diffusion()
+
+        async def collect():
+            return [snap async for snap in diff.aiter_solve(step_constant=0.2, every=10)]
+
+        snapshots = asyncio.run(collect())
+        assert [snap.step for snap in snapshots] == [0, 10, 20, 29]
+        assert np.array_equal(snapshots[-1].field, full.primal_domain[-1])
+
+    def test_aiter_solve_cancel(self):
+        diff = self.make_diffusion()
+
+        async def first_two():
+            stream = diff.aiter_solve(step_constant=0.2, maxsize=1)
+            steps = [(await stream.__anext__()).step for _ in range(2)]
+            await stream.aclose()
+            return steps
+
+        assert asyncio.run(first_two()) == [0, 1]
+        # the stepping stopped long before the end of the run
+        assert not diff.primal_domain[-1].any()
+
+    def test_iter_solve_checks_eagerly(self):
+        diff = self.make_diffusion()
+        with pytest.raises(ValueError):
+            diff.iter_solve(step_constant=5.0)
+        with pytest.raises(ValueError):
+            diff.iter_solve(step_constant=0.2, every=0)
+
+    def test_iter_solve_cancel_between_snapshots(self):
+        diff = self.make_diffusion()
+        cancel = threading.Event()
+        snapshots = diff.iter_solve(step_constant=0.2, every=1000, cancel=cancel)
+        assert next(snapshots).step == 0
+        cancel.set()
+        assert list(snapshots) == []
+        assert not diff.primal_domain[1].any()
+
+    def test_aiter_solve_cancel_large_every(self):
+        s = Space(dimension=Dimension.DD.value)
+        diff = Diffusion()
+        diff.set_primal_domain(space_array=s.setup(x_step=101, y_step=101),
+                               time_array=Time().setup(step=4001))
+        diff.set_initial_condition(0.0, Sphere(center=(0.5, 0.5), radius=0.2, value=10.0))
+
+        async def first():
+            stream = diff.aiter_solve(step_constant=0.2, every=4000)
+            step = (await stream.__anext__()).step
+            await stream.aclose()
+            return step
+
+        assert asyncio.run(first()) == 0
+        # closing did not wait for the snapshot 4000 steps later
+        assert not diff.primal_domain[-1].any()
+
+    def test_export_result(self, tmp_path):
+        diff = self.make_diffusion()
+        diff.solve(step_constant=0.2)
+        with diff.export_result(tmp_path / "run.h5", return_result=True) as res:
+            assert res.parameters['step_constant'] == 0.2
+            assert np.array_equal(res.read(), diff.primal_domain)
+        # exporting twice to the same path works once the Result is closed
+        path = diff.export_result(tmp_path / "run.h5")
+        assert diff.export_result(path) == path
 
 class TestDiffusionHeatmap:
 
@@ -64,7 +272,7 @@ class TestDiffusionHeatmap:
                                                         thickness=1)
         diff.solve(step_constant=0.03)
 
-        # write the simulation result in a csv
+        # write the simulation result to an h5 file
         if s.dimension == 1:
             diff.export_result()
         elif s.dimension == 2:
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from nietzsche.result import Result
+
+class TestResult:
+
+    def setup_method(self):
+        self.time = np.linspace(0.0, 1.0, 11)
+        self.space = [np.linspace(0, 1, 5), np.linspace(0, 2, 9)]
+        self.data = np.random.rand(11, 5, 9)
+
+    @pytest.mark.parametrize("name", ["run.h5", "run.npz"])
+    def test_round_trip(self, tmp_path, name):
+        path = tmp_path / name
+        assert Result.write(path, self.data, self.time, self.space, {'step_constant': 0.1}) == str(path)
+        with Result(path) as res:
+            assert res.shape == self.data.shape
+            assert res.parameters == {'step_constant': 0.1}
+            assert np.array_equal(res.space[1], self.space[1])
+            assert np.array_equal(res.read(), self.data)
+            assert np.array_equal(res.read(time=(0.2, 0.5), window=[(0.25, 0.5), (1.0, 2.0)]),
+                                  self.data[2:6, 1:3, 4:])
+            assert np.array_equal(res.probe((0.49, 1.26)), self.data[:, 2, 5])
+            assert np.array_equal(res.snapshot(0.71), self.data[7])
+
+    def test_write_shape_mismatch(self, tmp_path):
+        with pytest.raises(ValueError):
+            Result.write(tmp_path / "run.h5", self.data[1:], self.time, self.space)
+
+    def test_chunks(self, tmp_path):
+        path = tmp_path / "run.h5"
+        with Result.write(path, self.data, self.time, self.space, chunks=(11, 1, 3),
+                          return_result=True) as res:
+            assert res.data.chunks == (11, 1, 3)
+            assert np.array_equal(res.probe((0.5, 1.0)), self.data[:, 2, 4])
+        with Result.write(path, self.data, self.time, self.space, return_result=True) as res:
+            # all time levels in one chunk, space in small blocks
+            assert res.data.chunks[0] == 11
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from nietzsche.shapes import Shape, MaskedShape, Box, Sphere, Gaussian, Mask
+from nietzsche.space import Space
+from nietzsche.utils import Dimension
+
+class TestShapes:
+
+    def setup_method(self):
+        s = Space(dimension=Dimension.DD.value)
+        self.space = s.setup(x_step=11, y_step=21)
+        self.field = np.zeros((11, 21))
+
+    def test_box(self):
+        Box(lower=(0.2, 0.5), upper=(0.4, 1.0), value=3.0).apply(self.field, self.space)
+        assert np.all(self.field[2:5, 10:] == 3.0)
+        assert self.field.sum() == 3.0 * 3 * 11
+
+    def test_box_wrong_dimension(self):
+        with pytest.raises(ValueError):
+            Box(lower=(0.2, 0.5, 0.1), upper=1.0).apply(self.field, self.space)
+
+    def test_sphere(self):
+        Sphere(center=(0.5, 0.5), radius=0.1, value=1.0).apply(self.field, self.space)
+        x, y = np.meshgrid(*self.space, indexing='ij')
+        expected = (x - 0.5)**2 + (y - 0.5)**2 <= 0.1**2
+        assert np.array_equal(self.field == 1.0, expected)
+
+    def test_gaussian(self):
+        self.field.fill(1.0)
+        Gaussian(center=(0.5, 0.5), width=0.1, value=2.0).apply(self.field, self.space)
+        assert self.field[5, 10] == pytest.approx(3.0)
+        assert self.field.min() > 1.0
+
+    def test_mask_callable_and_array(self):
+        Mask(lambda x, y: x > 0.85, value=5.0).apply(self.field, self.space)
+        assert np.all(self.field[9:] == 5.0) and np.all(self.field[:9] == 0.0)
+        Mask(np.eye(11, 21, dtype=bool), value=-1.0).apply(self.field, self.space)
+        assert self.field[3, 3] == -1.0
+
+    def test_shape_needs_apply(self):
+        class Incomplete(Shape):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete(value=1.0)
+
+    def test_masked_shape_needs_mask(self):
+        class Incomplete(MaskedShape):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete(value=1.0)
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from nietzsche.stencil import (laplacian, explicit_step, blocked_solve, stable_step_constant,
+                               cache_block, _block_shape,
+                               rkl_step, super_stages, super_step_factor)
+
+class TestStencil:
+
+    def test_laplacian_2d(self):
+        u = np.random.rand(7, 9)
+        expected = np.zeros((5, 7))
+        for i in range(1, 6):
+            for j in range(1, 8):
+                expected[i-1, j-1] = u[i+1, j] + u[i-1, j] + u[i, j+1] + u[i, j-1] - 4*u[i, j]
+        assert np.allclose(laplacian(u), expected)
+
+    @pytest.mark.parametrize("order, rate", [(2, 2), (4, 4), (6, 6)])
+    def test_laplacian_order(self, order, rate):
+        errors = []
+        for n in (21, 41):
+            x = np.linspace(0, 1, n)
+            u = np.sin(2*x)[:, None] * np.cos(3*x)[None, :]
+            lap = laplacian(u, order=order) / (x[1] - x[0])**2
+            # leave out the rows of the fourth order closures next to the edge
+            r = order // 2
+            errors.append(np.abs(lap + 13*u[1:-1, 1:-1])[r-1:n-1-r, r-1:n-1-r].max())
+        assert np.log2(errors[0] / errors[1]) > rate - 0.3
+
+    @pytest.mark.parametrize("order", [4, 6])
+    def test_laplacian_exact_for_polynomials(self, order):
+        # the central stencils and the closures are exact up to degree five
+        # along the long axis; the short axis falls back to second order,
+        # which is exact for the quadratic
+        i, j = np.meshgrid(np.arange(5.0), np.arange(12.0), indexing='ij')
+        u = i**2 + j**5
+        lap = laplacian(u, work=np.empty((3, 10)), order=order)
+        expected = 2 + 20 * j**3
+        assert np.allclose(lap, expected[1:-1, 1:-1])
+
+    @pytest.mark.parametrize("order", [4, 6])
+    def test_laplacian_spectrum_is_real(self, order):
+        # the Runge-Kutta-Legendre schemes are only stable on the negative real axis
+        for n in (8, 12, 21, 41):
+            operator = np.array([laplacian(e, order=order) for e in np.eye(n)[1:-1]]).T
+            eigenvalues = np.linalg.eigvals(operator)
+            assert np.abs(eigenvalues.imag).max() < 1e-8
+            assert eigenvalues.real.max() < 0
+
+    def test_stable_step_constant(self):
+        assert stable_step_constant(1) == 0.5
+        assert stable_step_constant(3) == pytest.approx(1/6)
+        assert stable_step_constant(2, order=4) == pytest.approx(3/16)
+        assert stable_step_constant(1, order=6) == pytest.approx(45/136)
+        with pytest.raises(ValueError):
+            stable_step_constant(1, order=3)
+
+    def test_explicit_step_keeps_boundary(self):
+        src = np.random.rand(6, 6, 6)
+        dst = np.full(src.shape, -1.0)
+        explicit_step(src, dst, 0.1)
+        assert np.allclose(dst[1:-1, 1:-1, 1:-1], src[1:-1, 1:-1, 1:-1] + 0.1*laplacian(src))
+        assert np.all(dst[0] == -1.0) and np.all(dst[:, :, -1] == -1.0)
+
+    @pytest.mark.parametrize("block, time_block", [(3, 1), (4, 3), ((5, 4, None), 2), (50, 4),
+                                                   (None, 1), ('cube', 2)])
+    def test_blocked_solve_matches_full_array(self, block, time_block):
+        history = np.zeros((9, 12, 10, 11))
+        history[0] = np.random.rand(12, 10, 11)
+        history[:, 0] = 1.0
+        expected = history.copy()
+        for k in range(8):
+            explicit_step(expected[k], expected[k + 1], 0.1)
+        blocked_solve(history, 0.1, block=block, time_block=time_block)
+        assert np.array_equal(history, expected)
+
+    def test_cache_block(self):
+        assert cache_block((200, 200, 200), time_block=2, cache_bytes=2**20) == (28, 28, 28)
+        assert cache_block((10, 10, 10), time_block=2, cache_bytes=2**20) == (10, 10, 10)
+
+    def test_block_shape(self):
+        # slabs along x by default, the layout that measured faster than the full array
+        assert _block_shape((160, 160, 160), None, 1, 8, 2**20) == (8, None, None)
+        assert _block_shape((160, 160, 160), 16, 1, 8, 2**20) == (16, None, None)
+        assert _block_shape((200, 200, 200), 'cube', 2, 8, 2**20) == (28, 28, 28)
+        with pytest.raises(ValueError):
+            _block_shape((10, 10), 'slab', 1, 8, 2**20)
+
+    def test_super_stages(self):
+        assert super_step_factor(4, 'rkl1') == 10
+        assert super_step_factor(4, 'rkl2') == 4.5
+        assert super_stages(4.5 * 0.5, 0.5, 'rkl2') == 4
+        assert super_stages(4.6 * 0.5, 0.5, 'rkl2') == 5
+        with pytest.raises(ValueError):
+            super_step_factor(4, 'rk4')
+
+    @pytest.mark.parametrize("scheme, stages", [("rkl1", 5), ("rkl2", 9)])
+    def test_rkl_step(self, scheme, stages):
+        x = np.linspace(0, 1, 41)
+        dx = x[1] - x[0]
+        u = np.sin(np.pi * x)
+        v = u.copy()
+        # close to the largest stable super step
+        step_constant = 0.49 * super_step_factor(stages, scheme)
+        nsteps = 10
+        for k in range(nsteps):
+            rkl_step(u, v, step_constant, stages, scheme)
+            u, v = v, u
+        exact = np.sin(np.pi * x) * np.exp(-np.pi**2 * nsteps * step_constant * dx**2)
+        assert np.abs(u - exact).max() < 0.02
+        # rough data stays bounded at the stability limit
+        w = np.random.rand(41)
+        w[0] = w[-1] = 0.0
+        for k in range(100):
+            rkl_step(w, w, 0.5 * super_step_factor(stages, scheme), stages, scheme)
+        assert np.abs(w).max() < 1.0
+
+    @pytest.mark.parametrize("order", [2, 4])
+    def test_rkl_step_reuses_scratch(self, order):
+        src = np.random.rand(12, 13, 11)
+        fresh, reused = np.zeros_like(src), np.zeros_like(src)
+        rkl_step(src, fresh, 2.0, 9, 'rkl2', order=order)
+        # dirty buffers from an earlier step must not leak into the result
+        buffers = [np.random.rand(*src.shape) for _ in range(3)]
+        scratch = [np.random.rand(10, 11, 9) for _ in range(3)]
+        for _ in range(2):
+            rkl_step(src, reused, 2.0, 9, 'rkl2', order=order, buffers=buffers, scratch=scratch)
+        assert np.allclose(fresh, reused, rtol=0, atol=1e-12)